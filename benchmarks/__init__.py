@@ -0,0 +1,7 @@
+"""Нагрузочные замеры страниц YaTube.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.run --posts 10000 --output report.json
+    python -m benchmarks.run --posts 10000 --baseline report.json
+"""
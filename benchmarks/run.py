@@ -0,0 +1,227 @@
+"""Замеры страниц YaTube на сгенерированных данных.
+
+Для каждой страницы считаются запросы в секунду, p50/p99 задержки,
+число SQL-запросов и пик памяти Python. Отчёт пишется в JSON и может
+сравниваться с базовым: при регрессии сверх допуска код выхода 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from posts.models import Comment, Follow, Group, Post, User  # noqa: E402
+from posts.utils import make_paginator  # noqa: E402
+
+from benchmarks.seed import seed  # noqa: E402
+
+COMPARED = ('p50_ms', 'p99_ms', 'queries', 'peak_kb')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--follows', type=int, default=10000)
+    parser.add_argument(
+        '--requests', type=int, default=200,
+        help='Сколько раз открыть каждую страницу.',
+    )
+    parser.add_argument(
+        '--database',
+        help='Файл SQLite для данных; по умолчанию база в памяти.',
+    )
+    parser.add_argument(
+        '--keepdb', action='store_true',
+        help='Не пересоздавать и не наполнять уже готовую базу --database.',
+    )
+    parser.add_argument('--output', help='Куда записать JSON-отчёт.')
+    parser.add_argument('--baseline', help='JSON-отчёт для сравнения.')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='Допустимый рост метрик относительно базового отчёта.',
+    )
+    return parser.parse_args(argv)
+
+
+def get_pages():
+    """Имена и (пользователь, адрес) страниц, которые замеряются."""
+    post = Post.objects.select_related('author').order_by(
+        '-author__stats__posts_count'
+    ).first()
+    busy_post = Comment.objects.values_list('post_id', flat=True).first()
+    group = Group.objects.filter(posts__isnull=False).first()
+    reader = Follow.objects.values_list('user_id', flat=True).first()
+    reader = User.objects.get(pk=reader) if reader else post.author
+    deep_page = make_paginator(Post.objects.for_listing()).page(
+        min(50, make_paginator(Post.objects.all()).num_pages)
+    )
+    pages = {
+        'index': (None, reverse('posts:index')),
+        'index_deep': (
+            None,
+            reverse('posts:index') + '?' + urlencode(
+                {'cursor': deep_page.next_cursor or ''}
+            ),
+        ),
+        'group_list': (None, reverse(
+            'posts:group_list', kwargs={'slug': group.slug}
+        )),
+        'profile': (None, reverse(
+            'posts:profile', kwargs={'username': post.author.username}
+        )),
+        'post_detail': (None, reverse(
+            'posts:post_detail', kwargs={'post_id': busy_post or post.pk}
+        )),
+        'post_comments': (None, reverse(
+            'posts:post_comments', kwargs={'post_id': busy_post or post.pk}
+        )),
+        'follow_index': (reader, reverse('posts:follow_index')),
+        'search': (
+            None,
+            reverse('posts:search') + '?' + urlencode(
+                {'q': post.text.split()[0]}
+            ),
+        ),
+    }
+    return pages
+
+
+def measure(client, url, requests):
+    client.get(url)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(url)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    # Журнал запросов ограничен по длине; заполненный, он не даёт
+    # CaptureQueriesContext увидеть новые запросы.
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    query_count = len(queries)
+    # Память меряется отдельным запросом: tracemalloc замедляет Python
+    # в разы и исказил бы задержки.
+    tracemalloc.start()
+    client.get(url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        'url': url,
+        'requests': requests,
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            * 1000, 3
+        ),
+        'queries': query_count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Печатает разницу с базовым отчётом и возвращает число регрессий."""
+    regressions = 0
+    for name, result in report['views'].items():
+        base = baseline['views'].get(name)
+        if base is None:
+            continue
+        for metric in COMPARED:
+            old, new = base[metric], result[metric]
+            change = (new - old) / old if old else 0
+            flag = ''
+            if change > tolerance:
+                regressions += 1
+                flag = '  <-- регрессия'
+            print(f'{name:15} {metric:8} {old:>10} -> {new:>10} '
+                  f'({change:+.0%}){flag}')
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database:
+        settings.DATABASES['default']['TEST'] = {'NAME': args.database}
+    connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb)
+    sizes = {
+        'users': args.users,
+        'groups': args.groups,
+        'posts': args.posts,
+        'comments': args.comments,
+        'follows': args.follows,
+    }
+    if not (args.keepdb and Post.objects.exists()):
+        started = time.perf_counter()
+        seed(**sizes)
+        print(f'Данные созданы за {time.perf_counter() - started:.1f} с')
+    report = {
+        'meta': {
+            'sizes': sizes,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'views': {},
+    }
+    # Настройки как в проде, без debug_toolbar; кэш свой и в памяти
+    # процесса, чтобы замер не зависел от общего.
+    with override_settings(
+        DEBUG=False,
+        ALLOWED_HOSTS=['*'],
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmarks',
+        }},
+    ):
+        for name, (user, url) in get_pages().items():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            result = measure(client, url, args.requests)
+            report['views'][name] = result
+            print(f'{name:15} {result["rps"]:>8} rps  '
+                  f'p50 {result["p50_ms"]:>8} ms  '
+                  f'p99 {result["p99_ms"]:>8} ms  '
+                  f'SQL {result["queries"]:>3}  '
+                  f'{result["peak_kb"]:>8} KiB')
+    if not args.keepdb:
+        connection.creation.destroy_test_db(
+            connection.settings_dict['NAME'], verbosity=0
+        )
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import random
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db.models import F
+from mixer.backend.django import mixer
+
+from posts import search, timeline
+from posts.counters import (
+    POST_COUNTERS, USER_COUNTERS, actual_post_counters, actual_user_counters
+)
+from posts.models import (
+    Comment, Follow, Group, Post, PostStats, TimelineEntry, UserStats
+)
+
+BATCH_SIZE = 1000
+
+
+def _batches(total, size=BATCH_SIZE):
+    while total > 0:
+        yield min(size, total)
+        total -= size
+
+
+def _bulk_create(model, objs):
+    """bulk_create по пачкам, не держа в памяти весь генератор."""
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, BATCH_SIZE))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+
+def _bulk_blend(model, total, **values):
+    """Создаёт total объектов mixer'ом, сохраняя их пачками.
+
+    Сигналы при этом не срабатывают, поэтому производные таблицы
+    (счётчики, ленты, поисковый индекс) потом строятся целиком.
+    """
+    with mixer.ctx(commit=False):
+        for size in _batches(total):
+            model.objects.bulk_create(
+                mixer.cycle(size).blend(model, **values),
+                ignore_conflicts=model is Follow,
+            )
+
+
+def seed(users, groups, posts, comments, follows, rng=None):
+    """Наполняет пустую базу и достраивает всё, что ведут сигналы."""
+    rng = rng or random.Random(0)
+    mixer.cycle(users).blend(User, username=mixer.sequence('user{0}'))
+    mixer.cycle(groups).blend(Group, slug=mixer.sequence('group-{0}'))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True)) or [None]
+
+    # Авторы выбираются по закону Ципфа: у немногих большинство постов
+    # и подписчиков, как в живых сетях.
+    weights = [1 / rank for rank in range(1, len(user_ids) + 1)]
+
+    def authors():
+        while True:
+            yield rng.choices(user_ids, weights)[0]
+
+    def random_ids(ids):
+        while True:
+            yield rng.choice(ids)
+
+    _bulk_blend(
+        Post, posts,
+        author_id=authors(), group_id=random_ids(group_ids), image='',
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    if post_ids:
+        _bulk_blend(
+            Comment, comments,
+            post_id=random_ids(post_ids), author_id=random_ids(user_ids),
+        )
+    _bulk_blend(
+        Follow, follows,
+        user_id=random_ids(user_ids), author_id=authors(),
+    )
+    Follow.objects.filter(user_id=F('author_id')).delete()
+    rebuild_derived()
+
+
+def rebuild_derived():
+    """Счётчики, ленты подписок и поисковый индекс по данным в базе."""
+    UserStats.objects.all().delete()
+    _bulk_create(
+        UserStats,
+        (
+            UserStats(user_id=user.pk, **{
+                name: getattr(user, f'actual_{name}')
+                for name in USER_COUNTERS
+            })
+            for user in actual_user_counters().iterator()
+        ),
+    )
+    PostStats.objects.all().delete()
+    _bulk_create(
+        PostStats,
+        (
+            PostStats(post_id=post.pk, **{
+                name: getattr(post, f'actual_{name}')
+                for name in POST_COUNTERS
+            })
+            for post in actual_post_counters().iterator()
+        ),
+    )
+    TimelineEntry.objects.all().delete()
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        timeline.backfill(user_id, author_id)
+    search.rebuild_index()
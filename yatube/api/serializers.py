@@ -0,0 +1,102 @@
+from operator import attrgetter
+
+from posts.models import PostStats
+
+
+class FieldsError(ValueError):
+    pass
+
+
+class Serializer:
+    """Объект модели в словарь для JSON.
+
+    fields — имя поля ответа и функция, достающая значение из объекта.
+    Разреженный набор (?fields=id,text) вычисляет только нужные поля.
+    """
+    fields = {}
+
+    def __init__(self, names=None):
+        names = names or list(self.fields)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise FieldsError(
+                'Неизвестные поля: {}. Доступны: {}.'.format(
+                    ', '.join(unknown), ', '.join(self.fields)
+                )
+            )
+        self.getters = [(name, self.fields[name]) for name in names]
+
+    def to_dict(self, obj):
+        return {name: getter(obj) for name, getter in self.getters}
+
+
+def _username(path):
+    get = attrgetter(path)
+    return lambda obj: get(obj).username
+
+
+def _post_group(post):
+    return post.group.slug if post.group_id else None
+
+
+def _post_image(post):
+    return post.image.url if post.image else None
+
+
+def _post_thumbnail(post):
+    if not post.thumbnail_url:
+        return None
+    return {
+        'url': post.thumbnail_url,
+        'width': post.thumbnail_width,
+        'height': post.thumbnail_height,
+        'srcset': post.thumbnail_srcset,
+    }
+
+
+def _comments_count(post):
+    try:
+        return post.stats.comments_count
+    except PostStats.DoesNotExist:
+        return 0
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'text': attrgetter('text'),
+        'pub_date': attrgetter('pub_date'),
+        'updated': attrgetter('updated'),
+        'author': _username('author'),
+        'group': _post_group,
+        'image': _post_image,
+        'thumbnail': _post_thumbnail,
+        'comments_count': _comments_count,
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'title': attrgetter('title'),
+        'slug': attrgetter('slug'),
+        'description': attrgetter('description'),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'post': attrgetter('post_id'),
+        'author': _username('author'),
+        'text': attrgetter('text'),
+        'created': attrgetter('created'),
+    }
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'user': _username('user'),
+        'author': _username('author'),
+    }
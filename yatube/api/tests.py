@@ -0,0 +1,143 @@
+import json
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import assert_max_queries
+
+
+def read_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url, **params):
+        """Все объекты списка, пройденного по ссылкам next."""
+        results = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertTrue(response.streaming)
+            data = read_json(response)
+            results += data['results']
+            if not data['next']:
+                return results
+            response = self.client.get(data['next'])
+
+    def test_posts_are_paged_by_cursor(self):
+        results = self.walk(reverse('api:post_list'))
+        self.assertEqual(
+            [post['id'] for post in results],
+            [post.pk for post in reversed(self.posts)],
+        )
+        self.assertEqual(results[-1]['author'], 'author')
+        self.assertEqual(results[-1]['group'], 'group')
+        self.assertEqual(results[-1]['comments_count'], 1)
+
+    def test_sparse_fields_limit_and_filters(self):
+        url = reverse('api:post_list')
+        with assert_max_queries(self, 2):
+            data = read_json(self.client.get(
+                url, {'fields': 'id,text', 'limit': 3, 'author': 'author'}
+            ))
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertIn('fields=id%2Ctext', data['next'])
+        self.assertEqual(
+            len(self.walk(url, group='group', fields='id')), len(self.posts)
+        )
+
+    def test_errors_are_json(self):
+        cases = (
+            (reverse('api:post_list'), {'fields': 'password'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:post_list'), {'limit': 1000},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:post_list'), {'group': 'missing'},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:post_detail', kwargs={'post_id': 0}), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:feed'), {}, HTTPStatus.UNAUTHORIZED),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+        self.assertEqual(
+            self.client.post(reverse('api:post_list')).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED,
+        )
+
+    def test_detail_comments_groups_follows(self):
+        post = self.posts[0]
+        data = read_json(self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': post.pk})
+        ))
+        self.assertEqual(data['text'], post.text)
+        comments = self.walk(
+            reverse('api:post_comments', kwargs={'post_id': post.pk})
+        )
+        self.assertEqual(comments[0]['author'], 'reader')
+        groups = self.walk(reverse('api:group_list'))
+        self.assertEqual(groups[0]['slug'], 'group')
+        self.client.force_login(self.reader)
+        follows = self.walk(reverse('api:follow_list'))
+        self.assertEqual(
+            follows, [{'id': follows[0]['id'], 'user': 'reader',
+                       'author': 'author'}]
+        )
+        self.assertEqual(
+            len(self.walk(reverse('api:feed'), fields='id')), len(self.posts)
+        )
+
+    def test_export_is_staff_only_and_streams(self):
+        url = reverse('api:export', kwargs={'model': 'comments'})
+        self.client.force_login(self.reader)
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.FORBIDDEN
+        )
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,created,text,post_id,author_id')
+        self.assertEqual(len(lines), 2)
+        response = self.client.get(
+            reverse('api:export', kwargs={'model': 'posts'}),
+            {'start': self.posts[3].pk},
+        )
+        self.assertEqual(len(list(response.streaming_content)), 2)
+        self.assertEqual(
+            self.client.get(url, {'shards': 2, 'shard': 5}).status_code,
+            HTTPStatus.BAD_REQUEST,
+        )
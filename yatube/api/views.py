@@ -0,0 +1,263 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from posts import conditional, export as exports
+from posts.models import Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.timeline import make_timeline_paginator
+from posts.utils import make_comments_paginator, make_paginator
+
+from .serializers import (
+    CommentSerializer, FieldsError, FollowSerializer, GroupSerializer,
+    PostSerializer
+)
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def error_response(detail, status):
+    return JsonResponse(
+        {'detail': detail},
+        status=status,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def api_view(view):
+    """Представление API только для чтения; ошибки отдаются JSON."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return error_response('Не найдено.', 404)
+        except FieldsError as exc:
+            return error_response(str(exc), 400)
+        except ApiError as exc:
+            return error_response(exc.detail, exc.status)
+    return wrapper
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError('Нужна авторизация.', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def get_serializer(serializer_class, request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return serializer_class()
+    return serializer_class(
+        [name.strip() for name in fields.split(',') if name.strip()]
+    )
+
+
+def get_int(request, name, default=None):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'{name} должен быть целым числом.')
+
+
+def get_limit(request):
+    """Размер страницы из ?limit=; None — размер страниц сайта."""
+    limit = get_int(request, 'limit')
+    if limit is None:
+        return None
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(
+            f'limit должен быть от 1 до {settings.API_MAX_PAGE_SIZE}.'
+        )
+    return limit
+
+
+def page_link(request, cursor):
+    if not cursor:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.path + '?' + query.urlencode()
+
+
+def stream_page(request, page, serializer):
+    """Тело ответа по кускам: объекты кодируются и уходят по одному."""
+    yield '{"results": ['
+    for number, obj in enumerate(page.object_list):
+        yield (', ' if number else '') + encoder.encode(
+            serializer.to_dict(obj)
+        )
+    yield '], "next": {}, "previous": {}}}'.format(
+        encoder.encode(page_link(request, page.next_cursor)),
+        encoder.encode(page_link(request, page.previous_cursor)),
+    )
+
+
+def page_response(request, paginator, serializer_class):
+    """Страница по курсору ?cursor= в формате {results, next, previous}.
+
+    Ошибки в параметрах обнаруживаются до начала потока, пока ещё
+    можно ответить кодом 400.
+    """
+    serializer = get_serializer(serializer_class, request)
+    page = paginator.get_cursor_page(request.GET.get('cursor'))
+    return StreamingHttpResponse(
+        stream_page(request, page, serializer),
+        content_type='application/json',
+    )
+
+
+def object_response(request, obj, serializer_class):
+    return JsonResponse(
+        get_serializer(serializer_class, request).to_dict(obj),
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@api_view
+@condition(etag_func=conditional.index_etag)
+def post_list(request):
+    post_list = Post.objects.for_listing()
+    group = request.GET.get('group')
+    if group:
+        post_list = post_list.filter(
+            group=get_object_or_404(Group.objects.only('pk'), slug=group)
+        )
+    author = request.GET.get('author')
+    if author:
+        post_list = post_list.filter(
+            author=get_object_or_404(User.objects.only('pk'), username=author)
+        )
+    return page_response(
+        request, make_paginator(post_list, get_limit(request)), PostSerializer
+    )
+
+
+@api_view
+@condition(etag_func=conditional.post_etag)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_listing(), pk=post_id)
+    return object_response(request, post, PostSerializer)
+
+
+@api_view
+@condition(etag_func=conditional.post_etag)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return page_response(
+        request,
+        make_comments_paginator(post_id, get_limit(request)),
+        CommentSerializer,
+    )
+
+
+@api_view
+@condition(etag_func=conditional.index_etag)
+def group_list(request):
+    paginator = CursorPaginator(
+        Group.objects.order_by('pk'),
+        get_limit(request) or settings.POSTS_PER_PAGE,
+        ordering=('pk',),
+    )
+    return page_response(request, paginator, GroupSerializer)
+
+
+@api_view
+@condition(etag_func=conditional.group_etag)
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return object_response(request, group, GroupSerializer)
+
+
+@api_view
+@login_required
+@condition(etag_func=conditional.follow_etag)
+def follow_list(request):
+    """Подписки текущего пользователя, новые первыми."""
+    follows = Follow.objects.filter(user=request.user).select_related(
+        'user', 'author'
+    ).only('user__username', 'author__username').order_by('-pk')
+    paginator = CursorPaginator(
+        follows,
+        get_limit(request) or settings.POSTS_PER_PAGE,
+        ordering=('-pk',),
+    )
+    return page_response(request, paginator, FollowSerializer)
+
+
+@api_view
+@login_required
+@condition(etag_func=conditional.follow_etag)
+def feed(request):
+    """Лента подписок текущего пользователя."""
+    return page_response(
+        request,
+        make_timeline_paginator(request.user, get_limit(request)),
+        PostSerializer,
+    )
+
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+@api_view
+def export(request, model):
+    """Потоковая выгрузка таблицы для сотрудников, как команда export.
+
+    Параметры: ?format=ndjson|csv, диапазон pk ?start= и ?stop=, доля
+    ?shard= из ?shards=. Оборванную выгрузку продолжают со ?start=,
+    равным последнему полученному pk плюс один.
+    """
+    if not request.user.is_staff:
+        raise ApiError('Выгрузка доступна только сотрудникам.', 403)
+    if model not in exports.MODELS:
+        raise Http404
+    model_class = exports.MODELS[model]
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in exports.FORMATS:
+        raise ApiError('format должен быть ndjson или csv.')
+    try:
+        start, stop = exports.resolve_range(
+            model_class,
+            get_int(request, 'start'),
+            get_int(request, 'stop'),
+            get_int(request, 'shard', 0),
+            get_int(request, 'shards', 1),
+        )
+    except ValueError as error:
+        raise ApiError(str(error))
+    response = StreamingHttpResponse(
+        exports.iter_lines(
+            model_class,
+            exports.iter_rows(model_class, start, stop),
+            export_format,
+        ),
+        content_type=EXPORT_CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{model}.{export_format}"'
+    )
+    return response
@@ -1,5 +1,22 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks  # noqa: F401
+        from .db import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas)
+        if settings.TEMPLATE_WARMUP:
+            from .template_warmup import warm_up
+            failed = warm_up()
+            if failed:
+                logger.error('Не разобрались шаблоны: %s', ', '.join(failed))
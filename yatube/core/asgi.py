@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+
+class ASGIHandler:
+    """ASGI-приложение поверх WSGI-приложения Django.
+
+    Django 2.2 не умеет ни ASGI, ни асинхронные представления, поэтому
+    разделение такое: соединения держит цикл событий ASGI-сервера
+    (uvicorn, daphne), а запрос целиком — middleware, ORM, шаблоны —
+    выполняется в пуле из ASGI_THREADS потоков. Простаивающее keep-alive
+    соединение или медленный клиент, который ещё шлёт тело запроса,
+    стоят корутину, а не поток; очередь к пулу тоже ждёт в цикле событий.
+    """
+
+    def __init__(self, application, executor=None):
+        self.application = application
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Дожидаемся запросов, которые ещё выполняются в пуле.
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.executor.shutdown
+                )
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        # Тело читается до того, как занять поток: медленная загрузка
+        # картинки не держит воркер.
+        body = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body', False):
+                    break
+            environ = get_environ(scope, body)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor, self.run, environ, loop, send
+            )
+        finally:
+            body.close()
+
+    def run(self, environ, loop, send):
+        """Выполняет WSGI-приложение в потоке пула.
+
+        Ответ отправляется отсюда же, кусок за куском: так потоковые
+        ответы не собираются в памяти, а response.close() (и с ним
+        request_finished, закрывающий соединения с базой) вызывается
+        в том потоке, где шёл запрос.
+        """
+        def call(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        response = self.application(environ, start_response)
+        try:
+            # По PEP 3333 start_response можно вызвать и при первой
+            # итерации ответа.
+            chunks = iter(response)
+            first = next(chunks, b'')
+            status, headers = started
+            call({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in headers
+                ],
+            })
+            for chunk in itertools.chain([first], chunks):
+                if chunk:
+                    call({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            call({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+
+def get_environ(scope, body):
+    """WSGI-окружение для ASGI-запроса; body — файл с телом запроса."""
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    size = body.tell()
+    body.seek(0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # По PEP 3333 строки окружения — байты, прочитанные как latin-1.
+        'SCRIPT_NAME': script_name.encode().decode('latin1'),
+        'PATH_INFO': path.encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = 'HTTP_' + name
+        if name in environ:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = environ[name] + separator + value
+        environ[name] = value
+    # Тело, пришедшее без Content-Length (chunked), Django иначе не прочтёт.
+    environ.setdefault('CONTENT_LENGTH', str(size))
+    return environ
@@ -0,0 +1,116 @@
+"""Прогон тестов через ASGIHandler.
+
+ASGIClientHandler подменяет обработчик тестового клиента Django: запрос
+клиента превращается в ASGI-сообщения, проходит ASGIHandler и пул потоков
+и возвращается тесту обычным HttpResponse с context и templates. Модуль же
+— плагин pytest, который включает это для всего набора тестов:
+
+    python -m pytest -p core.asgi_testing
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.test import client
+
+from .asgi import ASGIHandler
+
+# Один поток: тест всё равно ждёт ответа, а потоки пула не должны
+# копиться от клиента к клиенту.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='asgi-test')
+
+
+class ASGIClientHandler(client.ClientHandler):
+
+    def __call__(self, environ):
+        responses = []
+        # Тестовая база (SQLite в памяти, открытая транзакция TestCase)
+        # видна только через соединения основного потока — как в
+        # LiveServerTestCase, отдаём их потоку пула.
+        shared = list(connections.all())
+
+        def application(environ, start_response):
+            for connection in shared:
+                connections[connection.alias] = connection
+                connection.inc_thread_sharing()
+            try:
+                response = super(ASGIClientHandler, self).__call__(environ)
+                responses.append(response)
+                start_response(
+                    f'{response.status_code} {response.reason_phrase}',
+                    list(response.items()),
+                )
+                # ClientHandler уже закрыл ответ (или закроет потоковый,
+                # дочитав его), повторный close() закрыл бы тестовую базу.
+                yield from response
+            finally:
+                for connection in shared:
+                    connection.dec_thread_sharing()
+
+        messages = asyncio.run(self.send(application, environ))
+        response = responses[0]
+        start = messages[0]
+        assert start['status'] == response.status_code
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        # Тест видит то, что ушло клиенту через ASGI.
+        if response.streaming:
+            response.streaming_content = [body]
+        else:
+            response.content = body
+        return response
+
+    async def send(self, application, environ):
+        scope, body = get_scope(environ)
+        sent = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {'type': 'http.disconnect'}
+            received = True
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            sent.append(message)
+
+        await ASGIHandler(application, _executor)(scope, receive, send)
+        return sent
+
+
+def get_scope(environ):
+    """ASGI scope и тело запроса для WSGI-окружения тестового клиента."""
+    headers = []
+    for key, value in environ.items():
+        if key.startswith('HTTP_'):
+            name = key[5:]
+        elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = key
+        else:
+            continue
+        headers.append((
+            name.replace('_', '-').lower().encode('latin1'),
+            str(value).encode('latin1'),
+        ))
+    length = int(environ.get('CONTENT_LENGTH') or 0)
+    body = environ['wsgi.input'].read(length) if length else b''
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': environ['REQUEST_METHOD'],
+        'scheme': environ.get('wsgi.url_scheme', 'http'),
+        'path': environ['PATH_INFO'].encode('latin1').decode(),
+        'root_path': environ.get('SCRIPT_NAME', ''),
+        'query_string': environ.get('QUERY_STRING', '').encode('latin1'),
+        'headers': headers,
+        'client': (environ.get('REMOTE_ADDR', '127.0.0.1'), 0),
+        'server': (
+            environ.get('SERVER_NAME', 'testserver'),
+            int(environ.get('SERVER_PORT', 80)),
+        ),
+    }
+    return scope, body
+
+
+def pytest_configure(config):
+    client.ClientHandler = ASGIClientHandler
@@ -0,0 +1,228 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_size ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' total INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO cache_size (id, total) VALUES (0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN'
+    ' UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN'
+    ' UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache'
+    ' BEGIN UPDATE cache_size SET total = total - OLD.size + NEW.size'
+    ' WHERE id = 0; END',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в SQLite-файле в режиме WAL, общий для всех воркеров узла.
+
+    Записи живут до истечения TIMEOUT, а при превышении OPTIONS['MAX_BYTES']
+    вытесняются давно не читанные (LRU). Целые числа хранятся как INTEGER,
+    поэтому incr() выполняется одним UPDATE внутри транзакции.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._schema_ready = False
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                for statement in SCHEMA:
+                    db.execute(statement)
+                self._schema_ready = True
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    @staticmethod
+    def _load(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def _write(self, sql, key, value, timeout):
+        data, size = self._dump(value)
+        expires = self.get_backend_timeout(timeout)
+        cursor = self._db.execute(
+            sql, (key, data, expires, time.time(), size + len(key))
+        )
+        self._evict()
+        return cursor.rowcount
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ? AND expires <= ?',
+            (key, time.time()),
+        )
+        return bool(self._write(
+            'INSERT OR IGNORE INTO cache (key, value, expires, accessed, size)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            key, value, timeout,
+        ))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # UPSERT, а не REPLACE: при REPLACE не срабатывает триггер удаления
+        # и общий размер кэша разошёлся бы с действительным.
+        self._write(
+            'INSERT INTO cache (key, value, expires, accessed, size)'
+            ' VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET'
+            ' value = excluded.value, expires = excluded.expires,'
+            ' accessed = excluded.accessed, size = excluded.size',
+            self._key(key, version), value, timeout,
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, accessed FROM cache'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        if now - row[1] > 1:
+            # Метку LRU обновляем не чаще раза в секунду, чтобы чтения
+            # почти никогда не превращались в запись.
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return self._load(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders})'
+            ' AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()),
+        ).fetchall()
+        return {keys[key]: self._load(value) for key, value in rows}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ?'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version),
+                time.time(),
+            ),
+        )
+        return bool(cursor.rowcount)
+
+    def delete(self, key, version=None):
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            'SELECT 1 FROM cache'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.execute(
+                'UPDATE cache SET value = value + ?, accessed = ?'
+                " WHERE key = ? AND typeof(value) = 'integer'"
+                ' AND (expires IS NULL OR expires > ?)',
+                (delta, time.time(), key, time.time()),
+            )
+            if not cursor.rowcount:
+                raise ValueError(f"Key '{key}' not found or not an integer")
+            value = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _evict(self):
+        db = self._db
+        if self._total(db) <= self._max_bytes:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        excess = self._total(db) - self._max_bytes * 0.9
+        if excess > 0:
+            # Удаляем самые давние записи, пока их суммарный размер не
+            # покроет превышение бюджета.
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM ('
+                '  SELECT key, size, SUM(size) OVER ('
+                '   ORDER BY accessed, key ROWS UNBOUNDED PRECEDING'
+                '  ) AS freed FROM cache'
+                ' ) WHERE freed - size < ?)',
+                (excess,),
+            )
+
+    @staticmethod
+    def _total(db):
+        return db.execute('SELECT total FROM cache_size').fetchone()[0]
+
+    def close(self, **kwargs):
+        # Соединения живут весь поток: открывать SQLite на каждый запрос
+        # дороже, чем держать его.
+        pass
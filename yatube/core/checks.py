@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, Info, Tags, Warning, register
+
+from .template_warmup import compile_times
+
+
+@register(Tags.templates, deploy=True)
+def check_template_compile_times(app_configs, **kwargs):
+    """Разбирает шаблоны и сообщает, сколько это занимает."""
+    times = compile_times()
+    messages = [
+        Error(f'Шаблон {name} не разбирается: {error}', id='core.E001')
+        for name, _, error in times if error is not None
+    ]
+    messages += [
+        Warning(
+            f'Шаблон {name} разбирается {seconds * 1000:.1f} мс',
+            hint='Разбейте его на части или упростите теги.',
+            id='core.W001',
+        )
+        for name, seconds, error in times
+        if error is None and seconds > settings.TEMPLATE_COMPILE_WARNING
+    ]
+    if times:
+        slowest = ', '.join(
+            f'{name} {seconds * 1000:.1f} мс' for name, seconds, _ in times[:5]
+        )
+        messages.append(Info(
+            f'Шаблонов: {len(times)}, всего '
+            f'{sum(seconds for _, seconds, _ in times) * 1000:.1f} мс; '
+            f'дольше всех: {slowest}',
+            id='core.I001',
+        ))
+    return messages
@@ -0,0 +1,27 @@
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+
+
+def copy_database(source, target):
+    """Копирует файл SQLite source в target через backup API.
+
+    Копия согласована: backup читает источник в одной транзакции,
+    а писатели основной базы ждут только свою очередь страниц.
+    """
+    with closing(sqlite3.connect(source)) as src, \
+            closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+def replicate(aliases=None):
+    """Доносит основную базу до реплик — замена настоящей репликации.
+
+    Возвращает список обновлённых псевдонимов.
+    """
+    aliases = settings.DATABASE_REPLICAS if aliases is None else aliases
+    source = settings.DATABASES['default']['NAME']
+    for alias in aliases:
+        copy_database(source, settings.DATABASES[alias]['NAME'])
+    return list(aliases)
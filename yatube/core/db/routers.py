@@ -0,0 +1,60 @@
+import random
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Пока флаг поднят, чтения идут в основную базу: запрос только что писал
+# и должен видеть свои изменения, которые до реплик ещё не доехали.
+primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+class ReplicaRouter:
+    """Чтения — в случайную реплику из DATABASE_REPLICAS, запись — в default.
+
+    Без реплик в настройках всё идёт в default, как без роутера.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or primary_pinned.get():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В репликах те же строки, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает в реплики вместе с данными при репликации.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class pinned_to_primary(ContextDecorator):
+    """Контекст, в котором все чтения идут в основную базу."""
+
+    def __enter__(self):
+        self._token = primary_pinned.set(True)
+
+    def __exit__(self, *exc):
+        primary_pinned.reset(self._token)
+
+
+def use_primary(view):
+    """Декоратор представления, которое пишет в базу.
+
+    Само представление читает из основной базы, а ReplicaPinningMiddleware
+    ещё на DATABASE_PRIMARY_STICKY секунд отправляет туда и следующие
+    запросы пользователя, например страницу после редиректа.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.pin_primary = True
+        with pinned_to_primary():
+            return view(request, *args, **kwargs)
+    return wrapper
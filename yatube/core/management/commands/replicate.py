@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db.replication import replicate
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS. '
+        'С --interval повторяет копирование, изображая отставание реплик.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            metavar='SECONDS',
+            help='Повторять каждые SECONDS секунд, пока не прервут.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплик нет: задайте пути в YATUBE_DB_REPLICAS.'
+            )
+        interval = options['interval']
+        while True:
+            aliases = replicate()
+            self.stdout.write(f'Обновлены реплики: {", ".join(aliases)}')
+            if interval <= 0:
+                return
+            time.sleep(interval)
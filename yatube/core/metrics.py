@@ -0,0 +1,155 @@
+import threading
+import time
+from contextvars import ContextVar
+from time import perf_counter
+
+# Границы корзин гистограмм в секундах; для числа запросов — штуки.
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """Время запроса по частям: SQL, шаблоны и всё вместе."""
+
+    __slots__ = ('started', 'queries', 'db', 'templates')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.templates = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper().
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += perf_counter() - start
+            self.queries += 1
+
+    @property
+    def total(self):
+        return perf_counter() - self.started
+
+
+def add_template_time(seconds):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.templates += seconds
+
+
+class RollingHistogram:
+    """Гистограмма за последние window секунд.
+
+    Окно разбито на slices частей; устаревшая часть обнуляется при
+    первой записи в неё, поэтому запись стоит O(число корзин) без
+    фоновых потоков.
+    """
+
+    def __init__(self, buckets, window=300, slices=5):
+        self.buckets = buckets
+        self.slice_length = window / slices
+        self.slices = [self._empty(-1) for _ in range(slices)]
+
+    def _empty(self, epoch):
+        return {
+            'epoch': epoch,
+            'counts': [0] * (len(self.buckets) + 1),
+            'sum': 0.0,
+        }
+
+    def _epoch(self, now):
+        return int(now // self.slice_length)
+
+    def observe(self, value, now=None):
+        epoch = self._epoch(time.time() if now is None else now)
+        index = epoch % len(self.slices)
+        part = self.slices[index]
+        if part['epoch'] != epoch:
+            part = self.slices[index] = self._empty(epoch)
+        position = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                position = i
+                break
+        part['counts'][position] += 1
+        part['sum'] += value
+
+    def snapshot(self, now=None):
+        """(накопительные счётчики по корзинам, сумма, количество)."""
+        oldest = self._epoch(time.time() if now is None else now) - len(
+            self.slices
+        )
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for part in self.slices:
+            if part['epoch'] > oldest:
+                counts = [a + b for a, b in zip(counts, part['counts'])]
+                total += part['sum']
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class Registry:
+    """Гистограммы по представлениям в памяти процесса."""
+
+    METRICS = {
+        'request_seconds': SECONDS_BUCKETS,
+        'db_seconds': SECONDS_BUCKETS,
+        'template_seconds': SECONDS_BUCKETS,
+        'queries': QUERIES_BUCKETS,
+    }
+
+    def __init__(self, window=300):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view, timing, total):
+        values = {
+            'request_seconds': total,
+            'db_seconds': timing.db,
+            'template_seconds': timing.templates,
+            'queries': timing.queries,
+        }
+        with self._lock:
+            histograms = self._histograms.get(view)
+            if histograms is None:
+                histograms = self._histograms[view] = {
+                    name: RollingHistogram(buckets, self.window)
+                    for name, buckets in self.METRICS.items()
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def render(self):
+        """Гистограммы в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for name, buckets in self.METRICS.items():
+                metric = f'yatube_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                for view, histograms in items:
+                    counts, total, count = histograms[name].snapshot()
+                    bounds = [str(bound) for bound in buckets] + ['+Inf']
+                    for bound, value in zip(bounds, counts):
+                        lines.append(
+                            f'{metric}_bucket{{view="{view}",le="{bound}"}}'
+                            f' {value}'
+                        )
+                    lines.append(f'{metric}_sum{{view="{view}"}} {total}')
+                    lines.append(f'{metric}_count{{view="{view}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
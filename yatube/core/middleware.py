@@ -0,0 +1,135 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .db.routers import primary_pinned
+from .metrics import RequestTiming, current_timing, registry
+
+logger = logging.getLogger('core.requests')
+
+
+class TimingMiddleware:
+    """Время ответа, SQL и шаблонов для каждого запроса.
+
+    Отдаёт заголовок Server-Timing, пишет строку JSON в лог core.requests
+    (уровень INFO) и копит гистограммы для страницы /metrics/. На запрос
+    приходится пара вызовов perf_counter на каждый SQL-запрос и запись
+    в гистограммы, так что middleware можно держать включённым в проде.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        wrappers = ExitStack()
+        try:
+            for connection in connections.all():
+                wrappers.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+        except BaseException:
+            wrappers.close()
+            raise
+        finally:
+            current_timing.reset(token)
+        # У потокового ответа заголовки уходят раньше тела, и в
+        # Server-Timing попадает только время до первого байта.
+        response['Server-Timing'] = (
+            f'db;dur={timing.db * 1000:.2f};desc="{timing.queries} queries", '
+            f'tpl;dur={timing.templates * 1000:.2f}, '
+            f'total;dur={timing.total * 1000:.2f}'
+        )
+        if response.streaming:
+            # Тело читает базу, пока отдаётся клиенту: SQL считается до
+            # закрытия ответа, тогда же запрос попадает в лог и метрики.
+            def finish():
+                wrappers.close()
+                self.record(request, response, timing)
+
+            response.streaming_content = ClosingIterator(
+                response.streaming_content, finish
+            )
+        else:
+            wrappers.close()
+            self.record(request, response, timing)
+        return response
+
+    def record(self, request, response, timing):
+        total = timing.total
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.observe(view, timing, total)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'queries': timing.queries,
+                'db_ms': round(timing.db * 1000, 2),
+                'template_ms': round(timing.templates * 1000, 2),
+                'total_ms': round(total * 1000, 2),
+            }))
+
+
+class ClosingIterator:
+    """Итератор, который при close() один раз вызывает on_close.
+
+    В отличие от генератора, close() срабатывает, даже если тело так и
+    не начали читать.
+    """
+
+    def __init__(self, iterable, on_close):
+        self.iterator = iter(iterable)
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.iterator)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+
+
+PRIMARY_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinningMiddleware:
+    """Чтения после записи — из основной базы.
+
+    Запрос, который пишет (не GET или представление под use_primary),
+    целиком читает из default и ставит куку на DATABASE_PRIMARY_STICKY
+    секунд: пока реплики догоняют, запросы с этой кукой тоже не уходят
+    в реплики, и пользователь видит свой пост или комментарий сразу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in SAFE_METHODS
+        token = primary_pinned.set(
+            writes or PRIMARY_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            primary_pinned.reset(token)
+        if writes or getattr(request, 'pin_primary', False):
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                '1',
+                max_age=settings.DATABASE_PRIMARY_STICKY,
+                httponly=True,
+            )
+        return response
@@ -0,0 +1,78 @@
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils._os import safe_join
+from django.views import static
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.xml')
+# Заголовки и кадр gzip съедают выигрыш на совсем маленьких файлах.
+MIN_COMPRESS_SIZE = 256
+# Имя, которое дал ManifestStaticFilesStorage: style.0123456789ab.css.
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}(\.[^./]+)?$')
+FOREVER = 365 * 24 * 60 * 60
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в имени и .gz рядом с текстовыми файлами.
+
+    Сжатие делается один раз, в collectstatic, а не на каждый запрос.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Манифест готов только после всех проходов: промежуточные
+        # версии CSS сжимать незачем.
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        # mtime=0: одинаковый файл сжимается в одинаковые байты.
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) >= len(data):
+            return
+        if self.exists(name + '.gz'):
+            self.delete(name + '.gz')
+        self._save(name + '.gz', ContentFile(compressed))
+
+
+def accepts_gzip(request):
+    encodings = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding in encodings.split(','):
+        name, _, params = encoding.strip().partition(';')
+        if name.strip().lower() == 'gzip':
+            return params.replace(' ', '') not in ('q=0', 'q=0.0')
+    return False
+
+
+def serve(request, path):
+    """Отдаёт файл из STATIC_ROOT, сжатый заранее, если клиент согласен.
+
+    Файлы с хэшем в имени не меняются, поэтому кэшируются на год без
+    перепроверки: повторный визит не скачивает статику вовсе.
+    """
+    root = settings.STATIC_ROOT
+    name = path
+    if accepts_gzip(request) and os.path.isfile(safe_join(root, path + '.gz')):
+        # static.serve выставит Content-Encoding по расширению .gz.
+        name = path + '.gz'
+    response = static.serve(request, name, document_root=root)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_RE.search(path):
+        patch_cache_control(
+            response, public=True, max_age=FOREVER, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
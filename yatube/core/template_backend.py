@@ -0,0 +1,28 @@
+from time import perf_counter
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import add_template_time
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            add_template_time(perf_counter() - start)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, время отрисовки которых попадает в метрики."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super().from_string(template_code).template, self
+        )
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self
+        )
@@ -0,0 +1,57 @@
+import os
+from time import perf_counter
+
+from django.template import Engine, TemplateSyntaxError
+
+
+def get_engine():
+    return Engine.get_default()
+
+
+def template_names(engine=None):
+    """Имена всех шаблонов из каталогов DIRS, без шаблонов приложений."""
+    engine = engine or get_engine()
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if filename.endswith(('.html', '.txt')):
+                    path = os.path.join(root, filename)
+                    yield os.path.relpath(path, directory).replace(
+                        os.sep, '/'
+                    )
+
+
+def compile_times(engine=None):
+    """Время разбора каждого шаблона с диска, без кэша загрузчика.
+
+    Возвращает список (имя, секунды, ошибка) по убыванию времени.
+    """
+    engine = engine or get_engine()
+    results = []
+    for name in template_names(engine):
+        template, origin = engine.find_template(name)
+        source = origin.loader.get_contents(origin)
+        start = perf_counter()
+        error = None
+        try:
+            engine.from_string(source)
+        except TemplateSyntaxError as exc:
+            error = exc
+        results.append((name, perf_counter() - start, error))
+    return sorted(results, key=lambda result: result[1], reverse=True)
+
+
+def warm_up(engine=None):
+    """Заранее разбирает шаблоны, чтобы их положил кэширующий загрузчик.
+
+    Без кэширующего загрузчика прогрев бесполезен, но и вреда нет.
+    Возвращает имена шаблонов, которые не удалось разобрать.
+    """
+    engine = engine or get_engine()
+    failed = []
+    for name in template_names(engine):
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            failed.append(name)
+    return failed
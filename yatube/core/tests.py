@@ -1,6 +1,32 @@
+import asyncio
+import gzip
+import json
 from http import HTTPStatus
+import os
+import shutil
+import sqlite3
+import tempfile
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings.prod import TEMPLATES as PROD_TEMPLATES
+
+from .asgi import ASGIHandler
+from .asgi_testing import ASGIClientHandler
+from .cache import SQLiteCache
+from .checks import check_template_compile_times
+from .db.replication import copy_database
+from .db.routers import ReplicaRouter, pinned_to_primary
+from .db.sqlite3.base import DatabaseWrapper
+from .middleware import PRIMARY_COOKIE
+from .staticfiles import CompressedManifestStaticFilesStorage
+from .metrics import RollingHistogram
+from .template_warmup import get_engine, warm_up
 
 
 class ViewTestClass(TestCase):
@@ -9,3 +35,269 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, template)
+
+
+class TimingMiddlewareTests(TestCase):
+    def test_server_timing_and_metrics(self):
+        response = self.client.get('/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"}',
+            response.content.decode()
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_hidden_from_outside(self):
+        # За обратным прокси все приходят с 127.0.0.1.
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            response = self.client.get(
+                '/metrics/', REMOTE_ADDR='127.0.0.1', **headers
+            )
+            self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_streaming_response_queries_are_counted(self):
+        user = get_user_model().objects.create_user(
+            username='staff', is_staff=True
+        )
+        self.client.force_login(user)
+        url = reverse('api:export', kwargs={'model': 'posts'})
+        with self.assertLogs('core.requests', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'api:export')
+        # Запросы, сделанные при отдаче тела, тоже посчитаны.
+        self.assertEqual(record['queries'], len(queries))
+
+    def test_histogram_forgets_old_slices(self):
+        histogram = RollingHistogram((1, 10), window=60, slices=3)
+        histogram.observe(0.5, now=0)
+        histogram.observe(5, now=30)
+        self.assertEqual(histogram.snapshot(now=30), ([1, 2, 2], 5.5, 2))
+        self.assertEqual(histogram.snapshot(now=75), ([0, 1, 1], 5, 1))
+
+
+@override_settings(TEMPLATES=PROD_TEMPLATES)
+class TemplateWarmupTests(TestCase):
+    def test_warm_up_fills_cached_loader(self):
+        engine = get_engine()
+        self.assertEqual(warm_up(engine), [])
+        cached = engine.template_loaders[0].get_template_cache
+        self.assertIn('posts/index.html', cached)
+        self.assertIn('includes/header.html', cached)
+
+    @override_settings(TEMPLATE_COMPILE_WARNING=0)
+    def test_check_reports_compile_times(self):
+        ids = {message.id for message in check_template_compile_times(None)}
+        self.assertEqual(ids, {'core.W001', 'core.I001'})
+
+
+class ProductionSQLiteTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self):
+        wrapper = DatabaseWrapper({
+            'NAME': self.path,
+            'OPTIONS': {},
+            'TIME_ZONE': None,
+            'CONN_MAX_AGE': 0,
+            'AUTOCOMMIT': True,
+        }, alias='prod-test')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    @override_settings(
+        SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 0}
+    )
+    def test_pragmas_applied_and_writers_lock_upfront(self):
+        first = self.connect()
+        second = self.connect()
+        with first.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+        first.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True
+        )
+        with self.assertRaises(OperationalError):
+            second.set_autocommit(
+                False, force_begin_transaction_with_broken_autocommit=True
+            )
+
+
+class ReplicaRoutingTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_reads_go_to_replica_unless_pinned(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(None), 'replica1')
+        self.assertEqual(router.db_for_write(None), 'default')
+        with pinned_to_primary():
+            self.assertEqual(router.db_for_read(None), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+
+    def test_writes_pin_the_user_to_primary(self):
+        self.assertNotIn(PRIMARY_COOKIE, self.client.get('/').cookies)
+        author = get_user_model().objects.create_user(username='author')
+        self.client.force_login(
+            get_user_model().objects.create_user(username='reader')
+        )
+        response = self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}
+        ))
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_copy_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as db:
+            db.execute('CREATE TABLE t (x INTEGER)')
+            db.execute('INSERT INTO t VALUES (1)')
+        copy_database(source, target)
+        with sqlite3.connect(target) as db:
+            self.assertEqual(db.execute('SELECT x FROM t').fetchall(), [(1,)])
+
+
+class ASGITests(TestCase):
+    def test_request_body_and_headers_reach_wsgi(self):
+        def echo(environ, start_response):
+            body = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH']))
+            start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+            return [body, environ['HTTP_COOKIE'].encode()]
+
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/путь/',
+            'query_string': b'',
+            'headers': [(b'cookie', b'a=1'), (b'cookie', b'b=2')],
+        }
+        messages = [
+            {'type': 'http.request', 'body': b'he', 'more_body': True},
+            {'type': 'http.request', 'body': b'llo'},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(ASGIHandler(echo)(scope, receive, send))
+        self.assertEqual(sent[0]['status'], HTTPStatus.CREATED)
+        self.assertIn(
+            (b'x-path', '/путь/'.encode().decode('latin1').encode('latin1')),
+            sent[0]['headers'],
+        )
+        self.assertEqual(
+            b''.join(message.get('body', b'') for message in sent[1:]),
+            b'helloa=1; b=2',
+        )
+
+    def test_site_through_asgi(self):
+        self.client.handler = ASGIClientHandler(enforce_csrf_checks=False)
+        user = get_user_model().objects.create_user(username='asgi')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Через ASGI'}
+        )
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': user.username}
+        ))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Через ASGI')
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_timeout(self):
+        self.cache.set('key', 'value', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new value'))
+        self.assertFalse(self.cache.add('key', 'other value'))
+        self.assertEqual(self.cache.get('key'), 'new value')
+
+    def test_incr_is_shared_between_connections(self):
+        other = SQLiteCache(self.location, {})
+        self.cache.set('counter', 1)
+        self.assertEqual(other.incr('counter'), 2)
+        self.assertEqual(self.cache.incr('counter', 10), 12)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction_by_size(self):
+        cache = SQLiteCache(self.location, {'OPTIONS': {'MAX_BYTES': 5000}})
+        for number in range(10):
+            cache.set(f'key-{number}', 'x' * 1000)
+        self.assertIsNone(cache.get('key-0'))
+        self.assertEqual(cache.get('key-9'), 'x' * 1000)
+        self.assertLessEqual(cache._total(cache._db), 5000)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_collected_files_are_hashed_compressed_and_cached(self):
+        storage = CompressedManifestStaticFilesStorage(location=self.root)
+        css = b'body { background: url("../img/dot.png"); }\n' * 20
+        storage.save('css/site.css', ContentFile(css))
+        storage.save('img/dot.png', ContentFile(b'png'))
+        paths = {
+            name: (storage, name) for name in ('css/site.css', 'img/dot.png')
+        }
+        list(storage.post_process(paths))
+        name = storage.stored_name('css/site.css')
+        self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(storage.exists(name + '.gz'))
+        self.assertFalse(storage.exists(storage.stored_name('img/dot.png')
+                                        + '.gz'))
+
+        with override_settings(STATIC_ROOT=self.root):
+            response = self.client.get(
+                '/static/' + name, HTTP_ACCEPT_ENCODING='gzip, deflate'
+            )
+            body = b''.join(response.streaming_content)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            with storage.open(name) as file:
+                self.assertEqual(gzip.decompress(body), file.read())
+
+            response = self.client.get('/static/' + name)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            response = self.client.get('/static/css/site.css')
+            self.assertIn('no-cache', response['Cache-Control'])
@@ -1,6 +1,12 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
 
 
 def page_not_found(request, exception):
@@ -33,3 +39,28 @@ def csrf_failure(request, reason=''):
         request,
         'core/403csrf.html'
     )
+
+
+def metrics(request):
+    """Гистограммы TimingMiddleware в формате Prometheus.
+
+    Доступны сотрудникам и сборщику с заголовком
+    Authorization: Bearer <METRICS_TOKEN>. Адресу клиента не верим: за
+    прокси все запросы приходят с 127.0.0.1.
+    """
+    if not (has_metrics_token(request) or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
+def has_metrics_token(request):
+    if not settings.METRICS_TOKEN:
+        return False
+    scheme, _, token = request.META.get(
+        'HTTP_AUTHORIZATION', ''
+    ).partition(' ')
+    return scheme.lower() == 'bearer' and constant_time_compare(
+        token, settings.METRICS_TOKEN
+    )
@@ -0,0 +1,134 @@
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .utils import get_page_obj, make_paginator
+
+VERSION_KEY = 'posts:version'
+
+
+def get_cache():
+    """Бэкенд кэша постов; в проде это общий для всех воркеров кэш."""
+    return caches[settings.POSTS_CACHE_ALIAS]
+
+
+def _initial_version():
+    # После вытеснения или очистки ключа версия не должна совпасть ни с
+    # одной из уже выданных, поэтому она начинается с текущего времени.
+    return int(time.time() * 1000)
+
+
+def _version_key(scope):
+    return VERSION_KEY if scope is None else f'{VERSION_KEY}:{scope}'
+
+
+def get_version(scope=None):
+    """Версия постов или данных области scope (комментарии поста и т.п.)."""
+    cache = get_cache()
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope=None):
+    """Инвалидирует все закэшированные страницы постов разом.
+
+    С scope меняется только версия этой области.
+    """
+    cache = get_cache()
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+
+def get_or_compute(key, compute, timeout, scopes=()):
+    """Значение из кэша с защитой от одновременного пересчёта.
+
+    Запись хранит версию данных, время вычисления и срок годности.
+    Свежая запись пересчитывается заранее с вероятностью, растущей к
+    концу срока (XFetch), поэтому воркеры не истекают одновременно.
+    Пересчитывает только воркер, взявший блокировку; остальные тем
+    временем отдают прежнее значение, а если его нет — ждут результата
+    пересчёта. Запись устаревает вместе с общей версией и версиями
+    областей scopes.
+    """
+    cache = get_cache()
+    version = [get_version(scope) for scope in (None, *scopes)]
+    entry = cache.get(key)
+    if entry is not None:
+        entry_version, value, delta, expiry = entry
+        early = delta * settings.POSTS_CACHE_BETA * math.log(
+            random.random() or 1e-12
+        )
+        if entry_version == version and time.time() - early < expiry:
+            return value
+    lock_key = key + ':lock'
+    locked = cache.add(lock_key, 1, settings.POSTS_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry[1]
+        entry = _wait_for_entry(cache, key, lock_key, version)
+        if entry is not None:
+            return entry[1]
+        locked = cache.add(lock_key, 1, settings.POSTS_CACHE_LOCK_TIMEOUT)
+    try:
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        cache.set(
+            key,
+            (version, value, delta, time.time() + timeout),
+            timeout * 2,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+def _wait_for_entry(cache, key, lock_key, version):
+    """Запись версии version, которую пересчитывает другой воркер.
+
+    None, если ждать надоело или блокировку сняли без результата.
+    """
+    for _ in range(settings.POSTS_CACHE_WAIT_ATTEMPTS):
+        time.sleep(settings.POSTS_CACHE_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry
+        if lock_key not in cache:
+            return None
+    return None
+
+
+def get_cached_page_obj(post_list, request, prefix, scopes=()):
+    """Как get_page_obj, но страница берётся из кэша постов."""
+    page_number = request.GET.get('page') or ''
+    cursor = request.GET.get('cursor') or ''
+    digest = hashlib.md5(f'{page_number}|{cursor}'.encode()).hexdigest()
+
+    def compute():
+        page = get_page_obj(post_list, request)
+        return (
+            list(page.object_list),
+            page.number,
+            page.next_cursor,
+            page.previous_cursor,
+        )
+
+    state = get_or_compute(
+        f'posts:{prefix}:{digest}',
+        compute,
+        settings.POSTS_CACHE_TIMEOUT,
+        scopes,
+    )
+    return make_paginator(post_list).restore_page(*state)
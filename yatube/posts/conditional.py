@@ -0,0 +1,63 @@
+import hashlib
+
+from django.conf import settings
+
+from . import cache
+
+
+# Валидаторы для django.views.decorators.http.condition. Считаются без
+# запросов к базе постов, по версиям в кэше: общая версия меняется при
+# любой правке поста, версии областей — при комментариях и подписках.
+# Совпавший If-None-Match получает 304 ещё до вызова представления.
+def page_etag(request, *scopes):
+    """Слабый ETag страницы: версии данных, адрес и пользователь.
+
+    Слабый, потому что байты страницы всё равно разные: форма
+    комментария каждый раз получает новый CSRF-токен.
+    """
+    versions = [cache.get_version(scope) for scope in (None, *scopes)]
+    user = request.user.pk if request.user.is_authenticated else None
+    key = repr((
+        settings.POSTS_ETAG_SALT, request.get_full_path(), user, versions
+    ))
+    return 'W/"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+
+# Число комментариев выводит только главная, а их текст находит поиск.
+COMMENTS_SCOPE = 'comments'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def following_scope(user_id):
+    return f'following:{user_id}'
+
+
+def index_etag(request):
+    return page_etag(request, COMMENTS_SCOPE)
+
+
+def group_etag(request, slug):
+    return page_etag(request)
+
+
+def search_etag(request):
+    return page_etag(request, COMMENTS_SCOPE)
+
+
+def profile_etag(request, username):
+    return page_etag(request, profile_scope(username))
+
+
+def post_etag(request, post_id):
+    return page_etag(request, post_scope(post_id))
+
+
+def follow_etag(request):
+    return page_etag(request, following_scope(request.user.pk))
@@ -0,0 +1,98 @@
+from django.db.models import (
+    Count, F, IntegerField, OuterRef, Subquery, Value
+)
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, PostStats, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+POST_COUNTERS = {
+    'comments_count': (Comment, 'post'),
+}
+
+
+def _change(model, key, pk, field, delta):
+    """Атомарно сдвигает счётчик через F(); True, если строка нашлась."""
+    rows = model.objects.filter(**{key: pk})
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    return bool(rows.update(**{field: F(field) + delta}))
+
+
+def change_user_counter(user_id, field, delta):
+    if not _change(UserStats, 'user_id', user_id, field, delta) and delta > 0:
+        rebuild_user_stats(user_id)
+
+
+def change_post_counter(post_id, field, delta):
+    if not _change(PostStats, 'post_id', post_id, field, delta) and delta > 0:
+        rebuild_post_stats(post_id)
+
+
+def _subquery_count(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(counts, output_field=IntegerField()), Value(0)
+    )
+
+
+def actual_user_counters(users=None):
+    """Пересчитанные из исходных таблиц значения счётчиков пользователей."""
+    users = User.objects.all() if users is None else users
+    return users.order_by('pk').annotate(**{
+        f'actual_{name}': _subquery_count(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    })
+
+
+def actual_post_counters(posts=None):
+    """Пересчитанные из исходных таблиц значения счётчиков постов."""
+    posts = Post.objects.all() if posts is None else posts
+    return posts.order_by('pk').annotate(**{
+        f'actual_{name}': _subquery_count(model, field)
+        for name, (model, field) in POST_COUNTERS.items()
+    })
+
+
+def rebuild_user_stats(user_id):
+    user = actual_user_counters(User.objects.filter(pk=user_id)).first()
+    if user is None:
+        return None
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            name: getattr(user, f'actual_{name}') for name in USER_COUNTERS
+        },
+    )
+    return stats
+
+
+def rebuild_post_stats(post_id):
+    post = actual_post_counters(Post.objects.filter(pk=post_id)).first()
+    if post is None:
+        return None
+    stats, _ = PostStats.objects.update_or_create(
+        post_id=post_id,
+        defaults={
+            name: getattr(post, f'actual_{name}') for name in POST_COUNTERS
+        },
+    )
+    return stats
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; отсутствующая строка пересчитывается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return rebuild_user_stats(user.pk)
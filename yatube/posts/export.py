@@ -0,0 +1,100 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min
+
+from .models import Comment, Follow, Group, Post
+
+MODELS = {
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+    'groups': Group,
+}
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def get_fields(model):
+    """Столбцы выгрузки: собственные поля модели, внешние ключи как *_id."""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def shard_range(model, shard, shards):
+    """Диапазон pk [start, stop) доли shard из shards.
+
+    Доли — соседние отрезки pk, а не остатки от деления: каждый процесс
+    читает свой кусок таблицы по первичному ключу, не просматривая чужие.
+    """
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return 0, 0
+    span = bounds['high'] - bounds['low'] + 1
+    step = -(-span // shards)
+    start = bounds['low'] + shard * step
+    return start, min(start + step, bounds['high'] + 1)
+
+
+def resolve_range(model, start=None, stop=None, shard=0, shards=1):
+    """Итоговый диапазон pk: пересечение [start, stop) и доли shard."""
+    if shards < 1 or not 0 <= shard < shards:
+        raise ValueError('Доля должна быть в пределах 0 <= shard < shards')
+    if shards > 1:
+        low, high = shard_range(model, shard, shards)
+        start = low if start is None else max(start, low)
+        stop = high if stop is None else min(stop, high)
+    return start, stop
+
+
+def iter_rows(model, start=None, stop=None, chunk_size=CHUNK_SIZE):
+    """Строки модели по возрастанию pk в диапазоне [start, stop).
+
+    iterator() читает базу кусками по chunk_size строк и ничего не
+    кэширует, так что память не зависит от размера таблицы.
+    """
+    rows = model.objects.order_by('pk')
+    if start is not None:
+        rows = rows.filter(pk__gte=start)
+    if stop is not None:
+        rows = rows.filter(pk__lt=stop)
+    return rows.values_list(*get_fields(model)).iterator(
+        chunk_size=chunk_size
+    )
+
+
+class _Line:
+    """Файл для csv.writer, который отдаёт записанную строку обратно."""
+
+    def write(self, value):
+        return value
+
+
+def iter_lines(model, rows, export_format, header=True):
+    """Строки выгрузки в формате ndjson или csv."""
+    fields = get_fields(model)
+    if export_format == 'ndjson':
+        for row in rows:
+            yield encoder.encode(dict(zip(fields, row))) + '\n'
+        return
+    writer = csv.writer(_Line(), lineterminator='\n')
+    if header:
+        yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        ])
+
+
+def last_exported_pk(record, export_format):
+    """pk из последней полной записи выгрузки, None — если его нет.
+
+    Для ndjson запись — строка, для csv — уже разобранный список полей.
+    """
+    if export_format == 'ndjson':
+        return json.loads(record)['id']
+    value = record[0] if record else ''
+    return int(value) if value.isdigit() else None
@@ -1,5 +1,6 @@
 from django import forms
 
+from . import thumbnails
 from .models import Post, Comment
 
 
@@ -18,6 +19,11 @@ class PostForm(forms.ModelForm):
             )
         return data
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            thumbnails.reset(self.instance)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
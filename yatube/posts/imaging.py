@@ -0,0 +1,58 @@
+"""Сжатие загруженных картинок.
+
+Модуль не зависит от Django: normalize() выполняется в дочерних процессах
+пула, которые импортируют только его и Pillow.
+"""
+import io
+
+from PIL import Image, ImageOps, features
+
+WEBP_SUPPORTED = features.check('webp')
+
+
+def _to_rgb(image):
+    # Прозрачность JPEG не поддерживает: кладём картинку на белый фон.
+    if image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    ):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, 'white')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def normalize(data, max_size, quality, webp_quality):
+    """Сжатая копия картинки: (JPEG, WebP или None, (ширина, высота)).
+
+    Картинка поворачивается по EXIF и вписывается в квадрат max_size,
+    метаданные (EXIF с геометкой, XMP, комментарии) отбрасываются. Цветовой
+    профиль RGB сохраняется, иначе фото с телефонов в Display P3 поблекнут.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # Большой JPEG сразу декодируется с уменьшением в 2–8 раз.
+        original.draft('RGB', (max_size, max_size))
+        icc_profile = None
+        # Профиль CMYK или оттенков серого к RGB-пикселям не подходит:
+        # браузер исказил бы цвета сильнее, чем без профиля вовсе.
+        if original.mode in ('RGB', 'RGBA', 'P'):
+            icc_profile = original.info.get('icc_profile')
+        image = _to_rgb(ImageOps.exif_transpose(original))
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    jpeg = io.BytesIO()
+    image.save(
+        jpeg,
+        'JPEG',
+        quality=quality,
+        optimize=True,
+        progressive=True,
+        icc_profile=icc_profile,
+    )
+    webp = None
+    if WEBP_SUPPORTED:
+        buffer = io.BytesIO()
+        image.save(
+            buffer, 'WEBP', quality=webp_quality, icc_profile=icc_profile
+        )
+        webp = buffer.getvalue()
+    return jpeg.getvalue(), webp, image.size
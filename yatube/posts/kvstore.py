@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+
+class LRUCache:
+    """Ограниченный словарь в памяти процесса, общий для всех потоков.
+
+    Записи живут не дольше timeout секунд: миниатюры могут удалить
+    из другого процесса командой sorl, а сюда об этом не сообщат.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Значение и признак, нашлось ли оно."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None, False
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None, False
+            self._data.move_to_end(key)
+            return value, True
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local = LRUCache(
+    settings.POSTS_THUMBNAIL_LRU_SIZE, settings.POSTS_THUMBNAIL_LRU_TIMEOUT
+)
+
+
+def is_local(key):
+    """Можно ли держать запись key в памяти процесса.
+
+    Список миниатюр картинки sorl дописывает чтением и записью, и делают
+    это все процессы: устаревшая копия в памяти затёрла бы чужие миниатюры.
+    """
+    return not key.startswith(add_prefix('', 'thumbnails'))
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище sorl: память процесса, затем общий кэш, затем база.
+
+    Отсутствие ключа тоже запоминается, чтобы повторный промах не шёл
+    в базу. prefetch() поднимает ключи целой страницы за один запрос
+    к кэшу и один к базе.
+    """
+
+    def _get_raw(self, key):
+        if not is_local(key):
+            return super()._get_raw(key)
+        value, found = local.get(key)
+        if not found:
+            value = super()._get_raw(key)
+            local.set(key, EMPTY_VALUE if value is None else value)
+        return None if value is EMPTY_VALUE else value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        if is_local(key):
+            local.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        local.delete(*keys)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        local.clear()
+
+    def prefetch(self, image_files):
+        """Загружает в память процесса записи для картинок image_files."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        missing = [key for key in keys if not local.get(key)[1]]
+        if not missing:
+            return
+        values = self.cache.get_many(missing)
+        missing = [key for key in missing if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        for key, value in values.items():
+            local.set(key, value)
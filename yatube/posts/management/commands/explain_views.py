@@ -0,0 +1,135 @@
+import re
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import tokenize
+from posts.utils import make_paginator
+
+# «SCAN t» — проход по таблице, «SCAN t USING INDEX i» — по индексу;
+# поиск в виртуальной таблице FTS5 сюда не подходит.
+SCAN_RE = re.compile(
+    r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?'
+    r'(?P<index> USING (?:COVERING )?INDEX \w+)?$'
+)
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class Command(BaseCommand):
+    help = (
+        'Открывает страницы сайта, прогоняет их запросы через '
+        'EXPLAIN QUERY PLAN и падает, если какой-то читает таблицу целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--allow',
+            action='append',
+            default=[],
+            metavar='TABLE',
+            help='Таблица, полный проход по которой допустим.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда разбирает только планы SQLite.')
+        allowed = set(options['allow'])
+        tables = set(connection.introspection.table_names())
+        failures = 0
+        # Страницы не должны отдаваться из кэша, а всё, что запишут
+        # просмотры (сессия входа), откатывается.
+        with override_settings(
+            ALLOWED_HOSTS=['*'],
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'explain-views',
+            }},
+        ), transaction.atomic():
+            for user, url in self.get_urls():
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                scans = self.find_scans(queries, tables - allowed)
+                failures += len(scans)
+                self.stdout.write(
+                    f'{url}: запросов {len(queries)}, '
+                    f'полных проходов {len(scans)}'
+                )
+                for sql, table in scans:
+                    self.stdout.write(f'  SCAN {table}: {sql}')
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(f'Запросов с полным проходом: {failures}')
+        self.stdout.write(self.style.SUCCESS('Полных проходов нет'))
+
+    def get_urls(self):
+        """Пары (пользователь, адрес) для всех горячих страниц."""
+        urls = [(None, reverse('posts:index'))]
+        page = make_paginator(Post.objects.for_listing()).get_cursor_page()
+        if page.next_cursor:
+            urls.append((
+                None,
+                reverse('posts:index') + '?' + urlencode(
+                    {'cursor': page.next_cursor}
+                ),
+            ))
+        group = Group.objects.filter(posts__isnull=False).first()
+        if group is not None:
+            urls.append((
+                None,
+                reverse('posts:group_list', kwargs={'slug': group.slug}),
+            ))
+        post = Post.objects.select_related('author').first()
+        if post is not None:
+            urls += [
+                (None, reverse(
+                    'posts:profile',
+                    kwargs={'username': post.author.username},
+                )),
+                (None, reverse(
+                    'posts:post_detail', kwargs={'post_id': post.pk}
+                )),
+            ]
+            words = tokenize(post.text)
+            if words:
+                urls.append((
+                    None,
+                    reverse('posts:search') + '?' + urlencode({'q': words[0]}),
+                ))
+        comment = Comment.objects.order_by('-pk').first()
+        if comment is not None:
+            urls.append((None, reverse(
+                'posts:post_comments', kwargs={'post_id': comment.post_id}
+            )))
+        follow = Follow.objects.select_related('user').first()
+        reader = follow.user if follow else User.objects.first()
+        if reader is not None:
+            urls.append((reader, reverse('posts:follow_index')))
+        return urls
+
+    def find_scans(self, queries, tables):
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+                # Проход по индексу дёшев, только если порядок индекса
+                # совпадает с ORDER BY и LIMIT обрывает его; если же
+                # строки потом сортируются, индекс читается целиком.
+                sorted_later = TEMP_SORT in plan
+                for detail in plan:
+                    match = SCAN_RE.match(detail)
+                    if (match and match.group(1) in tables
+                            and (not match.group('index') or sorted_later)):
+                        scans.append((sql, match.group(1)))
+        return scans
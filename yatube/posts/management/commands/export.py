@@ -0,0 +1,139 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (
+    CHUNK_SIZE, FORMATS, MODELS, iter_lines, iter_rows, last_exported_pk,
+    resolve_range
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии, подписки или группы в NDJSON или '
+        'CSV по возрастанию pk. Выгрузку можно продолжить с места обрыва '
+        '(--resume) и разделить между процессами (--shard/--shards).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(MODELS))
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--output',
+            metavar='FILE',
+            help='Файл выгрузки; по умолчанию стандартный вывод.',
+        )
+        parser.add_argument('--start', type=int, metavar='PK',
+                            help='Первый pk (включительно).')
+        parser.add_argument('--stop', type=int, metavar='PK',
+                            help='Последний pk (не включительно).')
+        parser.add_argument('--shard', type=int, default=0,
+                            help='Номер доли, с нуля.')
+        parser.add_argument('--shards', type=int, default=1,
+                            help='На сколько долей по pk делится таблица.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Дописать --output, продолжив после последней строки.',
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        export_format = options['format']
+        output = options['output']
+        try:
+            start, stop = resolve_range(
+                model,
+                options['start'],
+                options['stop'],
+                options['shard'],
+                options['shards'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        header = True
+        mode = 'w'
+        if options['resume']:
+            if not output:
+                raise CommandError('Для --resume нужен --output.')
+            record = None
+            if os.path.exists(output):
+                if export_format == 'csv':
+                    record = last_row(output)
+                else:
+                    record = last_line(output)
+            if record is not None:
+                header = False
+                pk = last_exported_pk(record, export_format)
+                if pk is not None:
+                    start = pk + 1 if start is None else max(start, pk + 1)
+            mode = 'a'
+        rows = iter_rows(model, start, stop, options['chunk_size'])
+        lines = iter_lines(model, rows, export_format, header)
+        if output:
+            with open(output, mode, encoding='utf-8', newline='') as file:
+                count = write_lines(file, lines)
+        else:
+            count = write_lines(self.stdout, lines)
+        self.stderr.write(f'Записано строк: {count}')
+
+
+def write_lines(file, lines):
+    count = 0
+    for count, line in enumerate(lines, 1):
+        file.write(line)
+    return count
+
+
+def last_line(path):
+    """Последняя полная строка файла; недописанный хвост отрезается.
+
+    Файл читается с конца блоками, так что продолжение многогигабайтной
+    выгрузки не перечитывает её целиком.
+    """
+    with open(path, 'rb+') as file:
+        position = file.seek(0, os.SEEK_END)
+        data = b''
+        while position > 0 and data.count(b'\n') < 2:
+            step = min(64 * 1024, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+        end = data.rfind(b'\n')
+        file.truncate(position + end + 1)
+        if end == -1:
+            return None
+        return data[:end].rsplit(b'\n', 1)[-1].decode()
+
+
+def last_row(path):
+    """Последняя полная запись CSV; недописанный хвост отрезается.
+
+    В тексте бывают переводы строк внутри кавычек, так что по хвосту
+    файла не понять, где начинается запись: файл разбирается с начала.
+    """
+    with open(path, 'rb+') as file:
+        offset = 0
+        complete = False
+
+        def lines():
+            nonlocal offset, complete
+            for line in file:
+                offset += len(line)
+                complete = line.endswith(b'\n')
+                yield line.decode(errors='replace')
+
+        end = 0
+        row = None
+        # strict: оборванное поле в кавычках — ошибка, а не запись.
+        reader = csv.reader(lines(), strict=True)
+        try:
+            for record in reader:
+                if complete:
+                    end, row = offset, record
+        except csv.Error:
+            pass
+        file.truncate(end)
+        return row
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import thumbnails
+from posts.models import Post
+
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры для уже загруженных картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перерезать и те миниатюры, что уже есть.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Сколько картинок обрабатывать параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            # Посты, нарезанные до srcset, тоже дорезаются.
+            posts = posts.filter(
+                Q(thumbnail_url='') | Q(thumbnail_srcset='')
+            )
+        posts = posts.only('pk', 'image', 'image_width').order_by('pk')
+        done = 0
+        workers = max(options['workers'], 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in self.batches(posts.iterator()):
+                # Записи sorl о миниатюрах пачки — одним запросом.
+                thumbnails.prefetch(batch)
+                ids = [post.pk for post in batch]
+                if workers > 1:
+                    done += sum(pool.map(thumbnails.generate_in_worker, ids))
+                else:
+                    done += sum(map(thumbnails.generate_logged, ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Нарезано миниатюр: {done}'
+        ))
+
+    def batches(self, posts):
+        batch = []
+        for post in posts:
+            batch.append(post)
+            if len(batch) == BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
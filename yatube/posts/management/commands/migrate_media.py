@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.db.routers import pinned_to_primary
+from posts import cache
+from posts.models import Post
+from posts.storage import image_storage
+
+FIELDS = ('image', 'image_webp')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища по хэшу, '
+        'в posts/ab/cd/<хэш>.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов читать из базы за раз.',
+        )
+
+    @pinned_to_primary()
+    def handle(self, *args, **options):
+        moved = missing = 0
+        last_pk = 0
+        # Посты читаются пачками по pk: в памяти только текущая пачка,
+        # а перенос можно прервать и запустить снова.
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .exclude(image='')
+                .order_by('pk')
+                .values_list('pk', *FIELDS)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            for pk, *names in batch:
+                for field, name in zip(FIELDS, names):
+                    if not name or image_storage.is_addressed(name):
+                        continue
+                    if not image_storage.exists(name):
+                        missing += 1
+                        self.stderr.write(f'Пост {pk}: нет файла {name}')
+                        continue
+                    moved += self.move(pk, field, name)
+            last_pk = batch[-1][0]
+        if moved:
+            cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}'
+        ))
+
+    def move(self, pk, field, name):
+        with image_storage.open(name) as file:
+            new_name = image_storage.save(name, file)
+        updated = Post.objects.filter(pk=pk, **{field: name}).update(
+            # Карточки кэшируются по дате изменения, а адрес картинки
+            # в них поменялся.
+            updated=timezone.now(), **{field: new_name}
+        )
+        if not updated:
+            # Картинку успели заменить: новый файл посту не нужен.
+            image_storage.delete(new_name)
+            return 0
+        # У файлов до переноса нет счётчика ссылок, он удаляется сразу.
+        image_storage.remove(name)
+        return 1
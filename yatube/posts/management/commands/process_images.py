@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сжимает картинки постов, загруженные до того, как их стали '
+        'сжимать при загрузке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Сколько картинок обрабатывать параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        ids = (
+            Post.objects.exclude(image='')
+            .filter(image_width__isnull=True)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator()
+        )
+        workers = options['workers']
+        if workers > 1:
+            # Потоки только ждут пул процессов, где и идёт сжатие.
+            thumbnails.get_pool(workers)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                done = sum(pool.map(thumbnails.normalize_in_worker, ids))
+        else:
+            done = sum(map(thumbnails.normalize_logged, ids))
+        self.stdout.write(self.style.SUCCESS(f'Сжато картинок: {done}'))
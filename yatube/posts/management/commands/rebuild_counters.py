@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db.routers import pinned_to_primary
+from posts.counters import (
+    POST_COUNTERS, USER_COUNTERS, actual_post_counters, actual_user_counters
+)
+from posts.models import PostStats, UserStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не исправляя.',
+        )
+
+    # Сверять с отстающей репликой значит «чинить» верные счётчики.
+    @pinned_to_primary()
+    def handle(self, *args, **options):
+        check = options['check']
+        drift = self.sync(
+            UserStats, 'user_id', USER_COUNTERS,
+            actual_user_counters().select_related('stats'), check,
+        )
+        drift += self.sync(
+            PostStats, 'post_id', POST_COUNTERS,
+            actual_post_counters().select_related('stats'), check,
+        )
+        if check and drift:
+            raise CommandError(f'Расхождений в счётчиках: {drift}')
+        action = 'Найдено' if check else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} расхождений: {drift}'
+        ))
+
+    def sync(self, model, key, counters, objects, check):
+        drift = 0
+        for obj in objects.iterator():
+            actual = {
+                name: getattr(obj, f'actual_{name}') for name in counters
+            }
+            try:
+                stored = obj.stats
+            except model.DoesNotExist:
+                stored = None
+            if stored is not None and all(
+                getattr(stored, name) == value
+                for name, value in actual.items()
+            ):
+                continue
+            drift += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name} {obj.pk}: '
+                f'ожидалось {actual}'
+            )
+            if not check:
+                model.objects.update_or_create(
+                    **{key: obj.pk}, defaults=actual
+                )
+        return drift
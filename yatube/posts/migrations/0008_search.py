@@ -0,0 +1,103 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:32
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+
+FTS_SCHEMA = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+    " body, post_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+
+def create_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(FTS_SCHEMA)
+        except OperationalError:
+            # SQLite собран без FTS5: поиск пойдёт по таблице SearchPosting.
+            return
+        cursor.execute(
+            'INSERT INTO posts_search (rowid, body, post_id)'
+            ' SELECT id * 2, text, id FROM posts_post'
+        )
+        cursor.execute(
+            'INSERT INTO posts_search (rowid, body, post_id)'
+            ' SELECT id * 2 + 1, text, post_id FROM posts_comment'
+        )
+
+
+def fill_postings(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'posts_search'"
+            )
+            if cursor.fetchone():
+                return
+    from collections import Counter
+    import re
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    db = schema_editor.connection.alias
+
+    def postings(post_id, comment_id, text):
+        words = re.findall(r'\w+', (text or '').lower())
+        return [
+            SearchPosting(
+                term=term[:64],
+                post_id=post_id,
+                comment_id=comment_id,
+                frequency=frequency,
+            )
+            for term, frequency in Counter(words).items()
+        ]
+
+    for post in Post.objects.using(db).only('pk', 'text').iterator():
+        SearchPosting.objects.using(db).bulk_create(
+            postings(post.pk, None, post.text)
+        )
+    comments = Comment.objects.using(db).only('pk', 'post_id', 'text')
+    for comment in comments.iterator():
+        SearchPosting.objects.using(db).bulk_create(
+            postings(comment.post_id, comment.pk, comment.text)
+        )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Частота')),
+                ('comment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'post'], name='search_term_post_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
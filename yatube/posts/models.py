@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.conf import settings
 
+from .storage import image_storage
+
 User = get_user_model()
 
 
@@ -40,6 +42,25 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    listing_deferred = (
+        'author__password',
+        'author__last_login',
+        'author__is_superuser',
+        'author__email',
+        'author__is_staff',
+        'author__is_active',
+        'author__date_joined',
+        'group__description',
+    )
+
+    def for_listing(self):
+        """Посты со всем, что нужно карточке в списке, одним запросом."""
+        return self.select_related('author', 'group', 'stats').defer(
+            *self.listing_deferred
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -49,6 +70,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -67,11 +92,65 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=image_storage,
         blank=True
     )
+    image_webp = models.CharField(
+        'Картинка в WebP',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        editable=False,
+    )
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        'Ширина миниатюры',
+        null=True,
+        editable=False,
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        'Высота миниатюры',
+        null=True,
+        editable=False,
+    )
+    thumbnail_srcset = models.TextField(
+        'Миниатюры разных размеров',
+        blank=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -81,6 +160,13 @@ class Post(models.Model):
     def get_representation_text(self):
         return self.text[:settings.REPRESENTATION_LENGTH]
 
+    @property
+    def image_webp_url(self):
+        """Адрес WebP-варианта сжатой картинки или пустая строка."""
+        if not self.image_webp:
+            return ''
+        return self.image.storage.url(self.image_webp)
+
 
 class Comment(CreatedModel):
     text = models.TextField(
@@ -101,6 +187,12 @@ class Comment(CreatedModel):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
@@ -132,6 +224,12 @@ class Follow(models.Model):
                 name='user_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
@@ -139,3 +237,158 @@ class Follow(models.Model):
         user_full_name = self.user.get_user_name()
         author_full_name = self.author.get_user_name()
         return f'{user_full_name} подписан на {author_full_name}'
+
+
+class TimelineEntry(models.Model):
+    """Пост автора, разложенный в ленту подписчика при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики пользователя {self.user_id}'
+
+
+class PostStats(models.Model):
+    """Денормализованные счётчики поста."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пост',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики поста'
+        verbose_name_plural = 'Счётчики постов'
+
+    def __str__(self):
+        return f'Счётчики поста {self.post_id}'
+
+
+class SearchPosting(models.Model):
+    """Запись обратного индекса для баз данных без полнотекстового поиска."""
+    term = models.CharField(
+        'Слово',
+        max_length=64,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name='Комментарий',
+    )
+    frequency = models.PositiveIntegerField(
+        'Частота',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_post_idx'),
+        ]
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+
+    def __str__(self):
+        return f'{self.term} → {self.post_id}'
+
+
+class StoredFile(models.Model):
+    """Число ссылок на файл в хранилище картинок постов."""
+    name = models.CharField(
+        'Имя файла',
+        max_length=255,
+        primary_key=True,
+    )
+    references = models.PositiveIntegerField(
+        'Ссылок',
+        default=1,
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
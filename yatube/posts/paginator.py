@@ -0,0 +1,164 @@
+import hashlib
+import inspect
+from operator import attrgetter
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.inspect import method_has_no_args
+
+CURSOR_SALT = 'posts.paginator.cursor'
+DEFAULT_ORDERING = ('-pub_date', '-pk')
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки вместо OFFSET.
+
+    Страницы адресуются непрозрачными курсорами, в которых лежат значения
+    полей сортировки последнего (или первого) объекта страницы. Запрос
+    следующей страницы превращается в диапазонное чтение по индексу,
+    поэтому тысячная страница стоит столько же, сколько первая.
+    Последнее поле сортировки должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=DEFAULT_ORDERING,
+                 count_timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        self.count_timeout = count_timeout
+
+    @cached_property
+    def count(self):
+        """Общее число объектов, закэшированное на count_timeout секунд."""
+        if self.count_timeout is None:
+            return self._exact_count()
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return self._exact_count()
+        try:
+            sql = str(query)
+        except EmptyResultSet:
+            return 0
+        key = 'paginator-count:' + hashlib.md5(sql.encode()).hexdigest()
+        return cache.get_or_set(key, self._exact_count, self.count_timeout)
+
+    def _exact_count(self):
+        c = getattr(self.object_list, 'count', None)
+        if (callable(c) and not inspect.isbuiltin(c)
+                and method_has_no_args(c)):
+            return c()
+        return len(self.object_list)
+
+    def page(self, number):
+        """Страница по номеру (OFFSET), дополненная курсорами соседей."""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(
+            self.object_list.order_by(*self.ordering)
+            [bottom:bottom + self.per_page + 1]
+        )
+        has_next = len(rows) > self.per_page
+        return self._build_page(
+            rows[:self.per_page], number, has_next, number > 1
+        )
+
+    def get_cursor_page(self, cursor=None):
+        """Страница по курсору. Битый или пустой курсор даёт первую."""
+        values, backwards, number = self.decode_cursor(cursor)
+        rows = self._fetch(values, backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if values is None:
+            return self._build_page(rows, 1, has_more, False)
+        if backwards:
+            if not has_more:
+                # Дошли до начала списка: показываем настоящую первую
+                # страницу, а не её неполный хвост.
+                return self.get_cursor_page()
+            rows.reverse()
+            return self._build_page(rows, max(number, 2), True, True)
+        return self._build_page(rows, number, has_more, True)
+
+    def restore_page(self, rows, number, next_cursor, previous_cursor):
+        """Собирает страницу из сохранённых строк и курсоров."""
+        page = self._get_page(rows, number, self)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(
+                self.get_key(rows[-1]), False, number + 1
+            )
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(
+                self.get_key(rows[0]), True, number - 1
+            )
+        return self.restore_page(rows, number, next_cursor, previous_cursor)
+
+    def _fetch(self, values, backwards):
+        return self._fetch_from(
+            self.object_list, self.ordering, values, backwards
+        )
+
+    def _fetch_from(self, queryset, ordering, values, backwards):
+        """До per_page + 1 объектов после ключа values в порядке обхода."""
+        if values is not None:
+            queryset = queryset.filter(
+                _keyset_q(ordering, values, backwards)
+            )
+        if backwards:
+            ordering = [_invert(field) for field in ordering]
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def get_key(self, obj):
+        return tuple(
+            attrgetter(field.lstrip('-').replace('__', '.'))(obj)
+            for field in self.ordering
+        )
+
+    def encode_cursor(self, values, backwards, number):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+        return signing.dumps(
+            {'v': values, 'b': backwards, 'n': number},
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        """Возвращает (значения ключа, назад ли, номер страницы)."""
+        if not cursor:
+            return None, False, 1
+        try:
+            state = signing.loads(cursor, salt=CURSOR_SALT)
+            values = state['v']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return values, bool(state['b']), max(int(state['n']), 1)
+        except (signing.BadSignature, ValueError, TypeError, KeyError):
+            return None, False, 1
+
+
+def _keyset_q(ordering, values, backwards):
+    """Условие «строго после ключа» для лексикографической сортировки."""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != backwards
+        lookup = 'lt' if descending else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else '-' + field
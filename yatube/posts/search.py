@@ -0,0 +1,240 @@
+import math
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, When
+
+from .models import Comment, Post, SearchPosting
+
+FTS_TABLE = 'posts_search'
+MAX_TERMS = 8
+TERM_LENGTH = 64
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, как их режет токенайзер unicode61."""
+    return [
+        word[:TERM_LENGTH] for word in WORD_RE.findall((text or '').lower())
+    ]
+
+
+# Документы FTS5 адресуются rowid: чётные — посты, нечётные — комментарии.
+# Так запись индекса находится и удаляется без дополнительных таблиц.
+def post_rowid(post_id):
+    return post_id * 2
+
+
+def comment_rowid(comment_id):
+    return comment_id * 2 + 1
+
+
+_fts_tables = {}
+
+
+def fts_available():
+    """Есть ли таблица FTS5 в текущей базе; ответ запоминается."""
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        _fts_tables[name] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[name]
+
+
+class FTSIndex:
+    """Индекс во встроенной в SQLite таблице FTS5, ранжирование по BM25."""
+
+    def _replace(self, rowid, post_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body, post_id)'
+                ' VALUES (%s, %s, %s)',
+                [rowid, text, post_id],
+            )
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid]
+            )
+
+    def index_post(self, post):
+        self._replace(post_rowid(post.pk), post.pk, post.text)
+
+    def unindex_post(self, post_id):
+        self._delete(post_rowid(post_id))
+
+    def index_comment(self, comment):
+        self._replace(comment_rowid(comment.pk), comment.post_id, comment.text)
+
+    def unindex_comment(self, comment_id):
+        self._delete(comment_rowid(comment_id))
+
+    @staticmethod
+    def _quote(term):
+        # Слово берём в кавычки: пользовательский ввод не должен
+        # разбираться как синтаксис запросов FTS5.
+        return '"{}"'.format(term.replace('"', '""'))
+
+    def _matches(self, terms):
+        """SQL постов, где каждое слово есть в тексте или в комментариях.
+
+        Слова ищутся по отдельности: документ FTS5 — это пост или один
+        комментарий, а пост должен находиться, даже если слова
+        разошлись по ним, как в PostingIndex. Ранг поста — сумма
+        лучших BM25 по каждому слову.
+        """
+        per_term = ' UNION ALL '.join(
+            f'SELECT post_id, {number} AS term, rank FROM {FTS_TABLE}'
+            f' WHERE {FTS_TABLE} MATCH %s'
+            for number in range(len(terms))
+        )
+        sql = (
+            'SELECT post_id, SUM(rank) AS rank FROM ('
+            ' SELECT post_id, term, MIN(rank) AS rank'
+            f' FROM ({per_term}) GROUP BY post_id, term'
+            ') GROUP BY post_id HAVING COUNT(*) = %s'
+        )
+        return sql, [self._quote(term) for term in terms] + [len(terms)]
+
+    def count(self, terms):
+        sql, params = self._matches(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql})', params)
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, terms, offset, limit):
+        sql, params = self._matches(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM ({sql})'
+                ' ORDER BY rank, post_id DESC LIMIT %s OFFSET %s',
+                params + [limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostingIndex:
+    """Обратный индекс в обычной таблице, ранжирование по TF-IDF.
+
+    Используется там, где FTS5 нет. Находит посты, в тексте которых или
+    в комментариях к которым встречаются все слова запроса.
+    """
+
+    def _replace(self, post_id, comment_id, text):
+        SearchPosting.objects.filter(
+            post_id=post_id, comment_id=comment_id
+        ).delete()
+        SearchPosting.objects.bulk_create(
+            SearchPosting(
+                term=term,
+                post_id=post_id,
+                comment_id=comment_id,
+                frequency=frequency,
+            )
+            for term, frequency in Counter(tokenize(text)).items()
+        )
+
+    def index_post(self, post):
+        self._replace(post.pk, None, post.text)
+
+    def unindex_post(self, post_id):
+        SearchPosting.objects.filter(post_id=post_id).delete()
+
+    def index_comment(self, comment):
+        self._replace(comment.post_id, comment.pk, comment.text)
+
+    def unindex_comment(self, comment_id):
+        SearchPosting.objects.filter(comment_id=comment_id).delete()
+
+    def _matches(self, terms):
+        return (
+            SearchPosting.objects.filter(term__in=terms)
+            .order_by()
+            .values('post_id')
+            .annotate(matched=Count('term', distinct=True))
+            .filter(matched=len(terms))
+        )
+
+    def count(self, terms):
+        return self._matches(terms).count()
+
+    def ranked_ids(self, terms, offset, limit):
+        total = Post.objects.count() or 1
+        frequencies = dict(
+            SearchPosting.objects.filter(term__in=terms)
+            .order_by()
+            .values('term')
+            .annotate(df=Count('post_id', distinct=True))
+            .values_list('term', 'df')
+        )
+        weights = [
+            When(term=term, then=F('frequency') * math.log(1 + total / df))
+            for term, df in frequencies.items()
+        ]
+        rows = (
+            self._matches(terms)
+            .annotate(score=Sum(Case(*weights, output_field=FloatField())))
+            .order_by('-score', '-post_id')
+            .values_list('post_id', flat=True)
+        )
+        return list(rows[offset:offset + limit])
+
+
+def get_index():
+    return FTSIndex() if fts_available() else PostingIndex()
+
+
+class SearchResults:
+    """Ленивый список найденных постов для Paginator.
+
+    Из индекса читается только счётчик и идентификаторы текущей
+    страницы, сами посты подгружаются одним запросом.
+    """
+
+    def __init__(self, query, index=None):
+        self.terms = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+        self.index = index or get_index()
+
+    def count(self):
+        return self.index.count(self.terms) if self.terms else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('SearchResults supports slicing only')
+        if not self.terms:
+            return []
+        offset = item.start or 0
+        ids = self.index.ranked_ids(self.terms, offset, item.stop - offset)
+        posts = Post.objects.for_listing().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def rebuild_index():
+    """Строит индекс заново по всем постам и комментариям."""
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body, post_id)'
+                ' SELECT id * 2, text, id FROM posts_post'
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body, post_id)'
+                ' SELECT id * 2 + 1, text, post_id FROM posts_comment'
+            )
+        return
+    index = PostingIndex()
+    SearchPosting.objects.all().delete()
+    for post in Post.objects.only('pk', 'text').iterator():
+        index.index_post(post)
+    for comment in Comment.objects.only('pk', 'post_id', 'text').iterator():
+        index.index_comment(comment)
@@ -0,0 +1,137 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import cache, counters, search, timeline
+from .conditional import (
+    COMMENTS_SCOPE, following_scope, post_scope, profile_scope
+)
+from .models import (
+    Comment, Follow, Group, Post, PostStats, User, UserStats
+)
+from .storage import image_storage
+
+
+@receiver(post_save, sender=User)
+def on_user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def on_post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        PostStats.objects.get_or_create(post=instance)
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def on_post_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+    search.get_index().unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def on_post_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump_version()
+
+
+def stored_images(post):
+    """Файлы в хранилище по хэшу, на которые ссылается пост.
+
+    Поля читаются из __dict__: отложенное поле не должно подгружаться
+    ради каждого поста в списке. Файлы, загруженные до хранилища по
+    хэшу, ссылок не считают и здесь не учитываются.
+    """
+    names = (post.__dict__.get('image'), post.__dict__.get('image_webp'))
+    return {
+        str(name) for name in names
+        if name and image_storage.is_addressed(str(name))
+    }
+
+
+@receiver(post_init, sender=Post)
+def on_post_loaded(sender, instance, **kwargs):
+    instance._stored_images = stored_images(instance)
+
+
+@receiver(post_save, sender=Post)
+def on_post_images_saved(sender, instance, raw=False, **kwargs):
+    # Картинку заменили: ссылка поста на прежний файл снимается.
+    if raw:
+        return
+    current = stored_images(instance)
+    for name in instance._stored_images - current:
+        image_storage.delete(name)
+    instance._stored_images = current
+
+
+@receiver(post_delete, sender=Post)
+def on_post_images_deleted(sender, instance, **kwargs):
+    for name in stored_images(instance):
+        image_storage.delete(name)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def on_group_changed(sender, instance, raw=False, **kwargs):
+    # Название и описание группы видны на её странице и в карточках.
+    if not raw:
+        cache.bump_version()
+
+
+@receiver(post_save, sender=Post)
+def on_post_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_index().index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def on_comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post_counter(instance.post_id, 'comments_count', 1)
+    if not raw:
+        search.get_index().index_comment(instance)
+        bump_comment_versions(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def on_comment_deleted(sender, instance, **kwargs):
+    counters.change_post_counter(instance.post_id, 'comments_count', -1)
+    search.get_index().unindex_comment(instance.pk)
+    bump_comment_versions(instance)
+
+
+def bump_comment_versions(comment):
+    # Комментарий меняет страницу поста, счётчики на главной и поиск;
+    # остальные списки и их кэш остаются как есть.
+    cache.bump_version(post_scope(comment.post_id))
+    cache.bump_version(COMMENTS_SCOPE)
+
+
+@receiver(post_save, sender=Follow)
+def on_follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_counter(instance.author_id, 'followers_count', 1)
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        bump_follow_versions(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def on_follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.author_unfollowed(instance.author_id)
+    bump_follow_versions(instance)
+
+
+def bump_follow_versions(follow):
+    # Подписка меняет счётчики и кнопку в профиле автора, счётчик
+    # подписок в профиле читателя и его ленту.
+    cache.bump_version(profile_scope(follow.author.username))
+    cache.bump_version(profile_scope(follow.user.username))
+    cache.bump_version(following_scope(follow.user_id))
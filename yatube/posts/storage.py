@@ -0,0 +1,100 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from core.db.routers import pinned_to_primary
+
+ADDRESSED_RE = re.compile(
+    r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$'
+)
+SHARD_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы называются хэшем содержимого и лежат во вложенных папках.
+
+    Имя вида posts/ab/cd/abcd….jpg: в каждой папке не больше 256
+    подпапок или немного файлов, а одинаковые загрузки хранятся один раз.
+    Каждый save() — ссылка на файл в StoredFile, каждый delete() её
+    снимает; сам файл удаляется вместе с последней ссылкой.
+    """
+
+    def addressed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        if self.is_addressed(name):
+            # Файл уже лежит по хэшу: папки ab/cd не вкладываются заново.
+            directory = SHARD_RE.sub('', directory)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def is_addressed(self, name):
+        return bool(ADDRESSED_RE.search(name))
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_addressed(name):
+            # Файл с этим именем успел записать одновременный save() тех
+            # же байтов: другое имя не нужно, _save() оставит это.
+            raise FileExistsError(name)
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            return name
+
+    def save(self, name, content, max_length=None):
+        # Модели импортируют хранилище, а не наоборот.
+        from .models import StoredFile
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.addressed_name(name, content)
+        with transaction.atomic():
+            if not StoredFile.objects.get_or_create(name=name)[1]:
+                StoredFile.objects.filter(name=name).update(
+                    references=F('references') + 1
+                )
+            if not self.exists(name):
+                name = self._save(name, content)
+        return name.replace('\\', '/')
+
+    def delete(self, name):
+        from .models import StoredFile
+
+        with transaction.atomic():
+            stored = StoredFile.objects.filter(name=name)
+            if stored.filter(references__gt=1).update(
+                references=F('references') - 1
+            ):
+                return
+            stored.delete()
+        # Файл удаляется, только если ссылка снята окончательно.
+        transaction.on_commit(lambda: self.remove(name))
+
+    def remove(self, name):
+        from .models import StoredFile
+
+        # Пока шла транзакция, файл могли загрузить заново; реплика этого
+        # может ещё не знать.
+        with pinned_to_primary(), transaction.atomic():
+            if not StoredFile.objects.filter(name=name).exists():
+                super().delete(name)
+
+
+image_storage = ContentAddressedStorage()
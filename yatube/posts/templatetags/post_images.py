@@ -0,0 +1,41 @@
+import re
+
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+WIDTH_RE = re.compile(r' (\d+)w$')
+
+
+def narrow_srcset(srcset, max_width):
+    """Варианты из srcset не шире max_width."""
+    entries = []
+    for entry in srcset.split(', '):
+        width = WIDTH_RE.search(entry)
+        if width and int(width.group(1)) <= max_width:
+            entries.append(entry)
+    return ', '.join(entries)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes=None, lazy=True):
+    """Картинка поста со srcset и размерами из базы, без чтения файла.
+
+    sizes — ширина картинки на странице для выбора из srcset; lazy=False
+    для картинки в первом экране. Без sizes это карточка списка: она не
+    шире основной миниатюры, и srcset без размеров крупнее неё.
+    """
+    srcset = post.thumbnail_srcset
+    max_width = None
+    if sizes is None:
+        sizes = settings.POSTS_THUMBNAIL_SIZES
+        max_width = post.thumbnail_width
+        srcset = narrow_srcset(srcset, max_width or 0)
+    return {
+        'post': post,
+        'srcset': srcset,
+        'sizes': sizes,
+        'max_width': max_width,
+        'lazy': lazy,
+    }
@@ -1,13 +1,28 @@
 from http import HTTPStatus
+from io import BytesIO, StringIO
+import os
 import shutil
 import tempfile
+from unittest import mock, skipUnless
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
 
-from ..models import Group, Post, User
+from .. import imaging, thumbnails
+from ..kvstore import local
+from ..models import Group, Post, StoredFile, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -112,6 +127,249 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(current_post.group, PostCreateFormTests.group)
         self.assertEqual(current_post.author, PostCreateFormTests.user)
 
+    def test_thumbnail_is_generated_outside_render(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': PostCreateFormTests.expected_text,
+                'image': SimpleUploadedFile(
+                    'small_3.gif', PostCreateFormTests.small_gif
+                ),
+            },
+        )
+        post = Post.objects.order_by('-pk').first()
+        self.assertEqual(post.thumbnail_url, '')
+        self.assertTrue(thumbnails.generate(post.pk))
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url.startswith(settings.MEDIA_URL))
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height), (480, 360)
+        )
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, post.thumbnail_url)
+        self.assertEqual(
+            [entry.split()[-1] for entry in post.thumbnail_srcset.split(', ')],
+            ['240w', '480w', '960w'],
+        )
+        # Шире сжатой картинки миниатюры не режутся, основная — всегда.
+        self.assertEqual(
+            thumbnails.get_geometries(300), ['240x180', '480x360']
+        )
+        self.assertContains(response, 'srcset="{}"'.format(
+            post.thumbnail_srcset
+        ))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+        # Карточке списка хватает основной миниатюры даже на телефоне.
+        self.assertContains(response, 'style="max-width: 480px"')
+        self.assertContains(response, ' 480w"')
+        self.assertNotContains(response, '960w')
+
+        Post.objects.filter(pk=post.pk).update(thumbnail_url='')
+        call_command(
+            'generate_thumbnails', workers=1, stdout=StringIO()
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.thumbnail_url, '')
+
+    @override_settings(POSTS_IMAGE_WORKERS=0, POSTS_IMAGE_MAX_SIZE=200)
+    def test_uploaded_image_is_normalized(self):
+        photo = BytesIO()
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera'
+        Image.new('RGB', (400, 100), 'red').save(
+            photo, 'JPEG', quality=100, exif=exif
+        )
+        post = Post.objects.create(
+            author=PostCreateFormTests.user,
+            text=PostCreateFormTests.expected_text,
+            image=SimpleUploadedFile('photo.jpeg', photo.getvalue()),
+        )
+        original = post.image.name
+        self.assertTrue(thumbnails.normalize(post.pk))
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (200, 50))
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/\w{64}\.jpg$')
+        # Файл удаляется после фиксации транзакции, ссылка снята сразу.
+        self.assertFalse(StoredFile.objects.filter(name=original).exists())
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (200, 50))
+            self.assertNotIn('exif', image.info)
+        # Сжатая картинка второй раз не обрабатывается.
+        self.assertFalse(thumbnails.normalize(post.pk))
+        if imaging.WEBP_SUPPORTED:
+            self.assertRegex(
+                post.image_webp, r'^posts/\w\w/\w\w/\w{64}\.webp$'
+            )
+        else:
+            self.assertEqual(post.image_webp, '')
+
+        Post.objects.filter(pk=post.pk).update(image_width=None)
+        out = StringIO()
+        call_command('process_images', workers=1, stdout=out)
+        self.assertIn('Сжато картинок: 1', out.getvalue())
+
+    def test_icc_profile_is_kept_only_for_rgb(self):
+        for mode, color, kept in (
+            ('RGB', 'red', True),
+            ('CMYK', (0, 255, 255, 0), False),
+        ):
+            with self.subTest(mode=mode):
+                photo = BytesIO()
+                Image.new(mode, (40, 40), color).save(
+                    photo, 'JPEG', icc_profile=b'profile'
+                )
+                jpeg, webp, size = imaging.normalize(
+                    photo.getvalue(), 20, 80, 80
+                )
+                with Image.open(BytesIO(jpeg)) as image:
+                    self.assertEqual(image.mode, 'RGB')
+                    self.assertEqual('icc_profile' in image.info, kept)
+
+    @skipUnless(imaging.WEBP_SUPPORTED, 'Pillow собран без WebP')
+    @override_settings(POSTS_IMAGE_WORKERS=0)
+    def test_webp_variant_is_offered(self):
+        post = Post.objects.create(
+            author=PostCreateFormTests.user,
+            text=PostCreateFormTests.expected_text,
+            image=SimpleUploadedFile(
+                'small_4.gif', PostCreateFormTests.small_gif
+            ),
+        )
+        self.assertTrue(thumbnails.normalize(post.pk))
+        post.refresh_from_db()
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, post.image_webp_url)
+
+    def test_warm_thumbnails_skip_kvstore_queries(self):
+        posts = [
+            Post.objects.create(
+                author=PostCreateFormTests.user,
+                text=PostCreateFormTests.expected_text,
+                image=SimpleUploadedFile(
+                    f'kv_{number}.gif',
+                    PostCreateFormTests.small_gif + bytes([number]),
+                ),
+            )
+            for number in range(3)
+        ]
+        for post in posts:
+            self.assertTrue(thumbnails.generate(post.pk))
+        local.clear()
+        cache.clear()
+
+        def kvstore_queries(queries):
+            return [
+                query for query in queries
+                if KVStoreModel._meta.db_table in query['sql']
+            ]
+
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts)
+        self.assertEqual(len(kvstore_queries(queries)), 1)
+        with CaptureQueriesContext(connection) as queries:
+            for post in posts:
+                self.assertTrue(thumbnails.generate(post.pk))
+        self.assertEqual(kvstore_queries(queries), [])
+        # Страницы берут миниатюры из полей поста и sorl не трогают.
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(kvstore_queries(queries), [])
+
+    def test_thumbnail_lists_bypass_process_memory(self):
+        store = default.kvstore
+        store._set('source', ['first'], identity='thumbnails')
+        # Другой процесс дописал свою миниатюру в общий кэш и базу.
+        cached_db_kvstore.KVStore()._set(
+            'source', ['first', 'second'], identity='thumbnails'
+        )
+        self.assertEqual(
+            store._get('source', identity='thumbnails'), ['first', 'second']
+        )
+
+    def test_identical_uploads_are_stored_once(self):
+        posts = [
+            Post.objects.create(
+                author=PostCreateFormTests.user,
+                text=PostCreateFormTests.expected_text,
+                image=SimpleUploadedFile(
+                    f'same_{number}.gif', PostCreateFormTests.small_gif
+                ),
+            )
+            for number in range(2)
+        ]
+        name = posts[0].image.name
+        self.assertEqual(posts[1].image.name, name)
+        self.assertRegex(name, r'^posts/\w\w/\w\w/\w{64}\.gif$')
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+        # Повторное сохранение под именем по хэшу не вкладывает папки.
+        storage = posts[0].image.storage
+        with storage.open(name) as file:
+            self.assertEqual(storage.save(name, file), name)
+        storage.delete(name)
+
+        posts[0].delete()
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        post = Post.objects.get(pk=posts[1].pk)
+        post.image = SimpleUploadedFile('other.gif', b'GIF89a' + b'\0' * 8)
+        post.save()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        # После фиксации транзакции файл без ссылок удаляется.
+        post.image.storage.remove(name)
+        self.assertFalse(post.image.storage.exists(name))
+
+    def test_concurrent_identical_upload_keeps_addressed_name(self):
+        post = Post.objects.create(
+            author=PostCreateFormTests.user,
+            text=PostCreateFormTests.expected_text,
+            image=SimpleUploadedFile(
+                'race.gif', PostCreateFormTests.small_gif
+            ),
+        )
+        storage = post.image.storage
+        name = post.image.name
+        # Второй save() проверил exists() до того, как первый записал файл.
+        answers = [False]
+        real_exists = storage.exists
+
+        def exists(checked):
+            return answers.pop() if answers else real_exists(checked)
+
+        with mock.patch.object(storage, 'exists', side_effect=exists):
+            saved = storage.save(
+                'posts/race.gif', ContentFile(PostCreateFormTests.small_gif)
+            )
+        self.assertEqual(saved, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+        self.assertEqual(
+            os.listdir(os.path.dirname(storage.path(name))),
+            [os.path.basename(name)],
+        )
+
+    def test_legacy_images_are_migrated(self):
+        legacy = FileSystemStorage()
+        name = legacy.save('posts/legacy.gif', ContentFile(
+            PostCreateFormTests.small_gif
+        ))
+        post = Post.objects.create(
+            author=PostCreateFormTests.user,
+            text=PostCreateFormTests.expected_text,
+        )
+        Post.objects.filter(pk=post.pk).update(image=name)
+        out = StringIO()
+        call_command(
+            'migrate_media', batch_size=1, stdout=out, stderr=StringIO()
+        )
+        self.assertIn('Перенесено файлов: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertTrue(post.image.storage.is_addressed(post.image.name))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertFalse(legacy.exists(name))
+
     def test_guest_cant_comment(self):
         comments_count = PostCreateFormTests.post.comments.count()
         self.guest_client.post(
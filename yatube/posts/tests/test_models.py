@@ -1,6 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-from ..models import Group, Post, User, Follow
+from ..models import (
+    Comment, Group, Post, PostStats, User, UserStats, Follow
+)
 
 
 class PostModelTest(TestCase):
@@ -59,3 +65,48 @@ class PostModelTest(TestCase):
         self.assertEqual(follow.user, PostModelTest.user_1)
         self.assertIsInstance(follow.author, User)
         self.assertEqual(follow.author, PostModelTest.user_2)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_signals(self):
+        post = Post.objects.create(author=CountersTest.author, text='Пост')
+        Comment.objects.create(
+            post=post, author=CountersTest.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(
+            user=CountersTest.reader, author=CountersTest.author
+        )
+        author_stats = UserStats.objects.get(user=CountersTest.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=CountersTest.reader).following_count,
+            1
+        )
+        self.assertEqual(PostStats.objects.get(post=post).comments_count, 1)
+
+        follow.delete()
+        post.delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        Post.objects.create(author=CountersTest.author, text='Пост')
+        UserStats.objects.filter(user=CountersTest.author).update(
+            posts_count=5
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=CountersTest.author).posts_count,
+            1
+        )
+        call_command('rebuild_counters', check=True, stdout=StringIO())
@@ -1,12 +1,26 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django import forms
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
 
-from ..models import Group, Post, User, Follow
+from ..models import Comment, Group, Post, User, Follow, TimelineEntry
+from .. import search
+from ..cache import get_or_compute
+from ..search import FTSIndex, PostingIndex, SearchResults
+from .utils import assert_max_queries
 
 
 class PostPagesTests(TestCase):
@@ -164,6 +178,68 @@ class PostPagesTests(TestCase):
                 response = self.authorized_client.get(reverse_name + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), expected)
 
+    def test_cursor_pages_contain_correct_records(self):
+        reverse_name = reverse('posts:index')
+        first_page = self.authorized_client.get(reverse_name).context[
+            'page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+
+        response = self.authorized_client.get(
+            reverse_name, {'cursor': first_page.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(
+            list(second_page),
+            list(Post.objects.order_by('-pub_date', '-pk'))[10:]
+        )
+        self.assertIsNone(second_page.next_cursor)
+
+        response = self.authorized_client.get(
+            reverse_name, {'cursor': second_page.previous_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page)
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_views_fit_query_budget(self):
+        Follow.objects.create(
+            user=PostPagesTests.user1,
+            author=PostPagesTests.user2
+        )
+        query_budgets = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_list', kwargs={'slug': 'test-slug-2'}): 4,
+            reverse('posts:profile', kwargs={'username': 'test-user-2'}): 5,
+            reverse('posts:post_detail', kwargs={'post_id': 1}): 4,
+            reverse('posts:follow_index'): 5,
+        }
+        for reverse_name, budget in query_budgets.items():
+            with self.subTest(reverse_name=reverse_name):
+                cache.clear()
+                with assert_max_queries(self, budget):
+                    self.authorized_client.get(reverse_name)
+
+    def test_hot_queries_use_indexes(self):
+        Comment.objects.create(
+            post=PostPagesTests.posts[0],
+            author=PostPagesTests.user2,
+            text='Тестовый комментарий',
+        )
+        Follow.objects.create(
+            user=PostPagesTests.user3,
+            author=PostPagesTests.user1
+        )
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        self.assertIn('Полных проходов нет', out.getvalue())
+
     def test_new_post_in_correct_places(self):
         author = PostPagesTests.user1
         correct_group = PostPagesTests.group1
@@ -192,27 +268,78 @@ class PostPagesTests(TestCase):
             author=PostPagesTests.user1,
             text='Пост для проверки кэша',
         )
+        new_post_id = new_post.pk
         response = self.authorized_client.get(reverse('posts:index'))
         context_page_after_creating_post = response.context['page_obj']
         content_after_creating_post = response.content
         self.assertIn(new_post, context_page_after_creating_post)
 
+        Post.objects.filter(pk=new_post_id).update(text='Без сигналов')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(content_after_creating_post, response.content)
+
         new_post.delete()
         response = self.authorized_client.get(reverse('posts:index'))
-        content_after_deleting_post = response.content
-        self.assertEqual(
-            content_after_creating_post,
-            content_after_deleting_post
+        self.assertNotIn(
+            new_post_id,
+            [post.pk for post in response.context['page_obj']]
         )
+        self.assertNotEqual(content_after_creating_post, response.content)
 
-        cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
-        content_after_clearing_cache = response.content
-        self.assertNotEqual(
-            content_after_creating_post,
-            content_after_clearing_cache
+    def test_post_card_is_cached_until_post_changes(self):
+        post = PostPagesTests.posts[0]
+        url = reverse('posts:profile', kwargs={'username': 'test-user-1'})
+        self.guest_client.get(url)
+        Post.objects.filter(pk=post.pk).update(text='Текст мимо карточки')
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Текст мимо карточки')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Отредактированный текст'},
+        )
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Отредактированный текст')
+
+    def test_post_card_follows_author_name(self):
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug-2'})
+        self.assertContains(self.guest_client.get(url), '[test-user-2]')
+        User.objects.filter(pk=PostPagesTests.user2.pk).update(
+            first_name='Новое', last_name='Имя'
+        )
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Новое Имя')
+        self.assertNotContains(response, '[test-user-2]')
+
+    def test_index_cache_is_shared_between_users_safely(self):
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_PER_PAGE
         )
 
+    def test_cold_cache_is_computed_once(self):
+        calls = []
+        results = []
+        start = threading.Barrier(5)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'страница'
+
+        def worker():
+            start.wait()
+            results.append(get_or_compute('posts:cold', compute, 20))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['страница'] * 5)
+
     def test_authorized_user_can_follow_and_unfollow(self):
         self.authorized_client.get(
             reverse(
@@ -251,6 +378,88 @@ class PostPagesTests(TestCase):
         response = self.authorized_client3.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 0)
 
+    def test_unfollow_removes_posts_from_timeline(self):
+        Follow.objects.create(
+            user=PostPagesTests.user3,
+            author=PostPagesTests.user1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=PostPagesTests.user3).count(),
+            2
+        )
+        self.authorized_client3.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': 'test-user-1'}
+            )
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=PostPagesTests.user3).exists()
+        )
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=1)
+    def test_numbered_feed_pages_keep_full_history(self):
+        Follow.objects.create(
+            user=PostPagesTests.user3,
+            author=PostPagesTests.user1
+        )
+        url = reverse('posts:follow_index')
+        response = self.authorized_client3.get(url)
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.authorized_client3.get(url, {'page': 1})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(Post.objects.filter(author=PostPagesTests.user1)),
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_on_demand(self):
+        Follow.objects.create(
+            user=PostPagesTests.user3,
+            author=PostPagesTests.user2
+        )
+        Post.objects.create(
+            author=PostPagesTests.user2,
+            text='Пост знаменитости',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=PostPagesTests.user3).exists()
+        )
+        response = self.authorized_client3.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            list(page_obj),
+            list(
+                Post.objects.filter(author=PostPagesTests.user2)
+            )[:settings.POSTS_PER_PAGE]
+        )
+        response = self.authorized_client3.get(
+            reverse('posts:follow_index'), {'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_below_fanout_limit_gets_materialized(self):
+        for user in (PostPagesTests.user1, PostPagesTests.user3):
+            Follow.objects.create(user=user, author=PostPagesTests.user2)
+        post = Post.objects.create(
+            author=PostPagesTests.user2,
+            text='Пост, пока подписчиков больше порога',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        Follow.objects.filter(
+            user=PostPagesTests.user1, author=PostPagesTests.user2
+        ).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=PostPagesTests.user3, post=post
+            ).exists()
+        )
+        response = self.authorized_client3.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
     def finish_test_for_pages_with_post_list(self, reverse_name, expected):
         response = self.authorized_client.get(reverse_name)
         for (key, value) in expected.items():
@@ -269,3 +478,284 @@ class PostPagesTests(TestCase):
             with self.subTest(value=value):
                 form_field = response.context.get('form').fields.get(value)
                 self.assertIsInstance(form_field, expected)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test-user')
+
+    def create_posts(self):
+        post = Post.objects.create(
+            author=self.user,
+            text='Котики и собаки, котики и ещё раз котики',
+        )
+        other = Post.objects.create(
+            author=self.user,
+            text='Про котиков и кошек',
+        )
+        Comment.objects.create(
+            post=other,
+            author=self.user,
+            text='Котики лучше всех',
+        )
+        return post, other
+
+    def search(self, query, index):
+        results = SearchResults(query, index=index)
+        return results.count(), results[0:settings.POSTS_PER_PAGE]
+
+    def test_indexes_rank_and_follow_changes(self):
+        for index in (FTSIndex(), PostingIndex()):
+            with self.subTest(index=type(index).__name__), \
+                    mock.patch.object(search, 'get_index', lambda: index):
+                Post.objects.all().delete()
+                post, other = self.create_posts()
+                self.assertEqual(
+                    self.search('КОТИКИ', index), (2, [post, other])
+                )
+                self.assertEqual(
+                    self.search('котики собаки', index), (1, [post])
+                )
+                self.assertEqual(self.search('лучше', index), (1, [other]))
+                self.assertEqual(self.search('"OR', index), (0, []))
+                post.text = 'Теперь про хомяков'
+                post.save()
+                other.delete()
+                self.assertEqual(self.search('котики', index), (0, []))
+                self.assertEqual(self.search('хомяков', index), (1, [post]))
+
+    def test_words_split_between_post_and_comment(self):
+        for index in (FTSIndex(), PostingIndex()):
+            with self.subTest(index=type(index).__name__), \
+                    mock.patch.object(search, 'get_index', lambda: index):
+                Post.objects.all().delete()
+                post, other = self.create_posts()
+                self.assertEqual(
+                    self.search('кошек лучше', index), (1, [other])
+                )
+                self.assertEqual(
+                    self.search('собаки лучше', index), (0, [])
+                )
+
+    def test_search_page(self):
+        post = self.create_posts()[1]
+        response = self.client.get(reverse('posts:search'), {'q': 'кошек'})
+        self.assertEqual(list(response.context['page_obj']), [post])
+        response = self.client.get(reverse('posts:search'))
+        self.assertIsNone(response.context['page_obj'])
+
+
+@override_settings(COMMENTS_PER_PAGE=2)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test-user')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+            for i in range(5)
+        ]
+
+    def test_post_detail_shows_first_comment_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:2])
+        self.assertContains(response, 'js-more-comments')
+
+    def test_comments_endpoint_walks_all_pages(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen = []
+        cursor = ''
+        while True:
+            data = self.client.get(
+                url, {'format': 'json', 'cursor': cursor}
+            ).json()
+            seen += [comment['id'] for comment in data['comments']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [comment.pk for comment in self.comments])
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['comments']), self.comments[:2])
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:post_comments', kwargs={'post_id': 0})
+            ).status_code,
+            HTTPStatus.NOT_FOUND
+        )
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def assert_revalidates(self, url, change):
+        """304 без рендера, пока данные те же, и 200 после change()."""
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.templates, [])
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_lists_change_with_posts(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        ):
+            with self.subTest(url=url):
+                self.assert_revalidates(url, lambda: Post.objects.create(
+                    author=self.author, group=self.group, text='Новый'
+                ))
+
+    def test_post_changes_with_comments(self):
+        self.assert_revalidates(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+        )
+
+    def test_index_and_search_change_with_comments(self):
+        # Поиск первым: до комментария слово «отклик» ничего не находит.
+        for url in (
+            reverse('posts:search') + '?q=Пост+отклик',
+            reverse('posts:index'),
+        ):
+            with self.subTest(url=url):
+                self.assert_revalidates(url, lambda: Comment.objects.create(
+                    post=self.post, author=self.reader, text='отклик'
+                ))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 2')
+
+    def test_other_pages_ignore_comments(self):
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        )
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_profile_and_feed_change_with_follows(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assert_revalidates(
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            follow.delete,
+        )
+        self.assert_revalidates(
+            reverse('posts:profile', kwargs={'username': 'reader'}),
+            lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            ),
+        )
+        self.assert_revalidates(
+            reverse('posts:follow_index'),
+            Follow.objects.filter(user=self.reader).delete,
+        )
+
+    def test_etag_depends_on_user_and_query(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'page': 2})['ETag'], etag)
+        self.client.logout()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+            for i in range(7)
+        ]
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_ndjson_and_csv(self):
+        rows = [json.loads(line) for line in self.export('posts').split('\n')
+                if line]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts]
+        )
+        self.assertEqual(rows[0]['author_id'], self.user.pk)
+        lines = self.export('posts', '--format', 'csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'text'])
+        self.assertEqual(len(lines), len(self.posts) + 1)
+
+    def test_shards_cover_table_once(self):
+        ids = []
+        for shard in range(3):
+            output = self.export(
+                'posts', '--shards', '3', '--shard', str(shard),
+                '--chunk-size', '2',
+            )
+            ids += [json.loads(line)['id'] for line in output.splitlines()]
+        self.assertEqual(ids, [post.pk for post in self.posts])
+
+    def test_resume_after_broken_line(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'posts.csv')
+        stop = str(self.posts[3].pk)
+        self.export('posts', '--format', 'csv', '--stop', stop,
+                    '--output', path)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('999,оборванная стр')
+        self.export('posts', '--format', 'csv', '--output', path, '--resume')
+        with open(path, encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        self.assertEqual(
+            [line.split(',')[0] for line in lines],
+            ['id'] + [str(post.pk) for post in self.posts],
+        )
+
+    def test_resume_csv_with_multiline_text(self):
+        # Продолжение строки похоже на начало записи с другим pk.
+        Post.objects.filter(pk__lte=self.posts[3].pk).update(
+            text=f'Первая строка\n{self.posts[6].pk},"вторая"'
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'posts.csv')
+        stop = str(self.posts[3].pk)
+        self.export('posts', '--format', 'csv', '--stop', stop,
+                    '--output', path)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('999,"оборванная\nстрока')
+        self.export('posts', '--format', 'csv', '--output', path, '--resume')
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(
+            [row[0] for row in rows],
+            ['id'] + [str(post.pk) for post in self.posts],
+        )
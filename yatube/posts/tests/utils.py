@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(testcase, budget):
+    """Проверяет, что блок уложился в budget SQL-запросов."""
+    with CaptureQueriesContext(connection) as context:
+        yield context
+    queries = '\n'.join(query['sql'] for query in context.captured_queries)
+    testcase.assertLessEqual(
+        len(context),
+        budget,
+        f'Выполнено {len(context)} запросов при бюджете {budget}:\n{queries}'
+    )
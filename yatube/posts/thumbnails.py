@@ -0,0 +1,264 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.db.routers import pinned_to_primary
+
+from . import cache, imaging
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_executor():
+    """Общий пул потоков, в котором режутся миниатюры."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def get_pool(max_workers=None):
+    """Пул процессов, в котором сжимаются картинки; None — сжимать здесь.
+
+    Pillow держит GIL на декодировании, поэтому сжатие вынесено из
+    процесса, а пул ограничен POSTS_IMAGE_WORKERS процессами. Процессы
+    запускаются с нуля (spawn), а не копией многопоточного сервера.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = max_workers or settings.POSTS_IMAGE_WORKERS
+            if max_workers < 1:
+                return None
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _pool
+
+
+def reset(post):
+    """Забывает миниатюру и сжатые копии поста, у которого сменилась
+    картинка."""
+    post.image_webp = ''
+    post.image_width = None
+    post.image_height = None
+    post.thumbnail_url = ''
+    post.thumbnail_width = None
+    post.thumbnail_height = None
+    post.thumbnail_srcset = ''
+
+
+def normalize(post_id):
+    """Заменяет загруженную картинку поста сжатой и кладёт рядом WebP.
+
+    Сторона ограничена POSTS_IMAGE_MAX_SIZE, метаданные вырезаны.
+    Уже сжатые картинки (с известными размерами) не трогаются. Если
+    картинку успели заменить, результат выбрасывается.
+    """
+    post = Post.objects.only('pk', 'image', 'image_width').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image or post.image_width is not None:
+        return False
+    name = post.image.name
+    with post.image.open('rb') as file:
+        data = file.read()
+    args = (
+        data,
+        settings.POSTS_IMAGE_MAX_SIZE,
+        settings.POSTS_IMAGE_QUALITY,
+        settings.POSTS_IMAGE_WEBP_QUALITY,
+    )
+    pool = get_pool()
+    if pool is None:
+        jpeg, webp, (width, height) = imaging.normalize(*args)
+    else:
+        jpeg, webp, (width, height) = pool.submit(
+            imaging.normalize, *args
+        ).result()
+    storage = post.image.storage
+    # Имя файла задаёт хранилище по хэшу, от upload_to нужна только папка.
+    field = post.image.field
+    jpeg_name = storage.save(
+        field.generate_filename(post, 'image.jpg'), ContentFile(jpeg)
+    )
+    webp_name = ''
+    if webp:
+        webp_name = storage.save(
+            field.generate_filename(post, 'image.webp'), ContentFile(webp)
+        )
+    updated = Post.objects.filter(pk=post_id, image=name).update(
+        image=jpeg_name,
+        image_webp=webp_name,
+        image_width=width,
+        image_height=height,
+        updated=timezone.now(),
+    )
+    if not updated:
+        for saved in filter(None, (jpeg_name, webp_name)):
+            storage.delete(saved)
+        return False
+    storage.delete(name)
+    cache.bump_version()
+    return True
+
+
+def normalize_logged(post_id):
+    """normalize(), ошибки которого уходят в лог, а не наружу."""
+    try:
+        return normalize(post_id)
+    except Exception:
+        logger.exception('Не удалось сжать картинку поста %s', post_id)
+        return False
+
+
+def get_geometries(image_width=None):
+    """Размеры миниатюр для srcset, от меньшей к большей.
+
+    Размеры шире самой картинки пропускаются: растянутая копия весит
+    больше, а чётче не становится. Основной размер режется всегда.
+    """
+    default = settings.POSTS_THUMBNAIL_GEOMETRY
+    geometries = [
+        geometry for geometry in settings.POSTS_THUMBNAIL_PRESETS
+        if image_width is None
+        or int(geometry.split('x')[0]) <= image_width
+    ]
+    geometries.append(default)
+    return sorted(
+        set(geometries), key=lambda geometry: int(geometry.split('x')[0])
+    )
+
+
+def thumbnail_file(source, geometry):
+    """Миниатюра source, как её назовёт sorl, без обращения к файлам.
+
+    Повторяет разбор параметров из ThumbnailBackend.get_thumbnail.
+    """
+    options = dict(settings.POSTS_THUMBNAIL_OPTIONS)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', default.backend._get_format(source))
+    for key, value in ThumbnailBackend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in ThumbnailBackend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def prefetch(posts):
+    """Поднимает записи sorl о миниатюрах постов одним заходом в кэш
+    и базу, чтобы нарезка уже нарезанного обошлась без запросов."""
+    kvstore = default.kvstore
+    if not hasattr(kvstore, 'prefetch'):
+        return
+    kvstore.prefetch([
+        thumbnail_file(ImageFile(post.image), geometry)
+        for post in posts if post.image
+        for geometry in get_geometries(post.image_width)
+    ])
+
+
+def generate(post_id):
+    """Режет миниатюры и сохраняет в посте основную, её размеры и srcset.
+
+    Если картинку успели заменить, результат не записывается: его
+    перезапишет задача, поставленная при замене.
+    """
+    post = Post.objects.only('pk', 'image', 'image_width').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image:
+        return False
+    prefetch([post])
+    thumbnails = {
+        geometry: get_thumbnail(
+            post.image, geometry, **settings.POSTS_THUMBNAIL_OPTIONS
+        )
+        for geometry in get_geometries(post.image_width)
+    }
+    thumbnail = thumbnails[settings.POSTS_THUMBNAIL_GEOMETRY]
+    srcset = ', '.join(
+        f'{variant.url} {variant.width}w' for variant in thumbnails.values()
+    )
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail_url=thumbnail.url,
+        thumbnail_width=thumbnail.width,
+        thumbnail_height=thumbnail.height,
+        thumbnail_srcset=srcset,
+        updated=timezone.now(),
+    )
+    if updated:
+        cache.bump_version()
+    return bool(updated)
+
+
+def generate_logged(post_id):
+    """generate(), ошибки которого уходят в лог, а не наружу."""
+    try:
+        return generate(post_id)
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюру поста %s', post_id)
+        return False
+
+
+def in_worker(job):
+    """Задача для потока пула: чтения из основной базы, соединения
+    закрываются по завершении."""
+    def run(post_id):
+        try:
+            # Задача ставится сразу после записи поста: реплики его
+            # могут ещё не видеть.
+            with pinned_to_primary():
+                return job(post_id)
+        finally:
+            # Поток пула живёт долго: соединение с базой ему не нужно
+            # копить.
+            connections.close_all()
+    return run
+
+
+def process(post_id):
+    """Новая картинка: сначала сжатие, потом миниатюра из сжатой."""
+    normalize_logged(post_id)
+    return generate_logged(post_id)
+
+
+generate_in_worker = in_worker(generate_logged)
+normalize_in_worker = in_worker(normalize_logged)
+process_in_worker = in_worker(process)
+
+
+def submit(post_id):
+    return get_executor().submit(process_in_worker, post_id)
+
+
+def schedule(post):
+    """Ставит сжатие и нарезку в пул после фиксации транзакции с постом."""
+    if post.image and not post.thumbnail_url:
+        post_id = post.pk
+        transaction.on_commit(lambda: submit(post_id))
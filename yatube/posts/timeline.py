@@ -0,0 +1,176 @@
+from django.conf import settings
+
+from .models import Follow, Post, PostQuerySet, TimelineEntry, UserStats
+from .paginator import CursorPaginator
+from .utils import select_page
+
+ENTRY_ORDERING = ('-pub_date', '-post_id')
+
+
+def celebrity_ids(authors):
+    """Авторы из authors, у которых подписчиков больше порога рассылки."""
+    return list(
+        UserStats.objects.filter(
+            user__in=authors,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Посты авторов с огромным числом подписчиков не раскладываются:
+    подписчики дочитывают их из posts_post при открытии ленты.
+    """
+    if celebrity_ids([post.author_id]):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                author_id=post.author_id,
+                post_id=post.pk,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def recent_posts(author_id):
+    """pk и даты свежих постов автора для раскладки задним числом.
+
+    Не больше TIMELINE_BACKFILL_LIMIT: более старые посты в
+    материализованную ленту не попадают, до них листают профиль автора.
+    """
+    return Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту свежие посты автора, на которого подписались."""
+    if celebrity_ids([author_id]):
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                author_id=author_id,
+                post_id=post_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in recent_posts(author_id)
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def materialize(author_id):
+    """Раскладывает свежие посты автора по лентам всех его подписчиков.
+
+    Пока у автора было больше TIMELINE_FANOUT_LIMIT подписчиков, его
+    посты и новые подписки на него в ленты не записывались. Когда он
+    опускается до порога, лента перестаёт дочитывать их на лету, и без
+    раскладки они бы из неё пропали.
+    """
+    posts = list(recent_posts(author_id))
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                author_id=author_id,
+                post_id=post_id,
+                pub_date=pub_date,
+            )
+            for user_id in followers.iterator()
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def author_unfollowed(author_id):
+    """Раскладывает посты автора, если отписка опустила его до порога."""
+    followers_count = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers_count == settings.TIMELINE_FANOUT_LIMIT:
+        materialize(author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: материализованные записи плюс посты знаменитостей.
+
+    Страница по курсору читается диапазоном из индекса ленты и, если
+    пользователь подписан на знаменитостей, сливается с их постами; от
+    каждого автора в ней не больше TIMELINE_BACKFILL_LIMIT постов,
+    опубликованных до подписки. Нумерованные страницы (?page=) и число
+    постов берутся запросом к posts_post и показывают всю историю.
+    """
+
+    def __init__(self, user, per_page, **kwargs):
+        self.entries = TimelineEntry.objects.filter(user=user)
+        celebrities = celebrity_ids(
+            Follow.objects.filter(user=user).values('author')
+        )
+        self.celebrity_posts = None
+        if celebrities:
+            self.celebrity_posts = Post.objects.filter(
+                author__in=celebrities
+            ).for_listing()
+        super().__init__(
+            Post.objects.filter(author__following__user=user).for_listing(),
+            per_page,
+            **kwargs
+        )
+
+    def _fetch(self, values, backwards):
+        entries = self._fetch_from(
+            self.entries.select_related(
+                'post__author', 'post__group', 'post__stats'
+            ).defer(*(
+                'post__' + field for field in PostQuerySet.listing_deferred
+            )),
+            ENTRY_ORDERING,
+            values,
+            backwards,
+        )
+        posts = {entry.post_id: entry.post for entry in entries}
+        if self.celebrity_posts is None:
+            return list(posts.values())
+        for post in self._fetch_from(
+            self.celebrity_posts, self.ordering, values, backwards
+        ):
+            posts.setdefault(post.pk, post)
+        rows = sorted(posts.values(), key=self.get_key, reverse=not backwards)
+        return rows[:self.per_page + 1]
+
+
+def make_timeline_paginator(user, per_page=None):
+    return TimelinePaginator(
+        user,
+        per_page or settings.POSTS_PER_PAGE,
+        count_timeout=settings.PAGINATOR_COUNT_TIMEOUT,
+    )
+
+
+def get_timeline_page(user, request):
+    """Страница ленты подписок по курсору (?cursor=) или номеру (?page=)."""
+    return select_page(make_timeline_paginator(user), request)
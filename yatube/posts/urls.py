@@ -15,6 +15,11 @@ urlpatterns = [
         views.group_posts,
         name='group_list'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'profile/<str:username>/',
         views.profile,
@@ -25,6 +30,11 @@ urlpatterns = [
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'create/',
         views.post_create,
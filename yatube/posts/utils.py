@@ -1,11 +1,58 @@
-from django.core.paginator import Paginator
 from django.conf import settings
 from django.contrib.auth.models import User
 
+from .models import Comment
+from .paginator import CursorPaginator
 
-def get_page_obj(post_list, page_number):
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    return paginator.get_page(page_number)
+COMMENT_ORDERING = ('created', 'pk')
+
+
+def make_paginator(post_list, per_page=None):
+    return CursorPaginator(
+        post_list,
+        per_page or settings.POSTS_PER_PAGE,
+        count_timeout=settings.PAGINATOR_COUNT_TIMEOUT,
+    )
+
+
+def get_page_obj(post_list, request):
+    """Страница постов по курсору (?cursor=) или по номеру (?page=)."""
+    return select_page(make_paginator(post_list), request)
+
+
+def select_page(paginator, request):
+    """Выбирает страницу по параметрам запроса ?cursor= или ?page=."""
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
+
+
+def get_comment_list(post_id):
+    """Комментарии поста от старых к новым, с авторами, одним запросом."""
+    return (
+        Comment.objects.filter(post_id=post_id)
+        .select_related('author')
+        .only('text', 'created', 'post_id', 'author__username')
+        .order_by(*COMMENT_ORDERING)
+    )
+
+
+def make_comments_paginator(post_id, per_page=None):
+    return CursorPaginator(
+        get_comment_list(post_id),
+        per_page or settings.COMMENTS_PER_PAGE,
+        ordering=COMMENT_ORDERING,
+    )
+
+
+def get_comments_page(post_id, request):
+    """Страница комментариев поста по курсору ?cursor=, от старых к новым.
+
+    Общее число комментариев не считается: оно есть в счётчиках поста.
+    """
+    paginator = make_comments_paginator(post_id)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
 
 
 def get_user_name(self):
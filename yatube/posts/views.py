@@ -1,16 +1,29 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+from core.db.routers import use_primary
 
 from .models import Post, Group, User, Follow
+from .cache import get_cached_page_obj
+from .counters import get_user_stats
 from .forms import PostForm, CommentForm
-from .utils import get_page_obj
+from . import conditional, thumbnails
+from .search import SearchResults
+from .timeline import get_timeline_page
+from .utils import get_comments_page, get_page_obj
 
 
-@cache_page(20)
+@condition(etag_func=conditional.index_etag)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = get_page_obj(post_list, request.GET.get('page'))
+    post_list = Post.objects.for_listing()
+    # Главная выводит число комментариев под каждым постом.
+    page_obj = get_cached_page_obj(
+        post_list, request, 'index', (conditional.COMMENTS_SCOPE,)
+    )
 
     context = {
         'page_obj': page_obj,
@@ -19,10 +32,11 @@ def index(request):
     return render(request, template, context)
 
 
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = get_page_obj(post_list, request.GET.get('page'))
+    post_list = group.posts.for_listing()
+    page_obj = get_page_obj(post_list, request)
 
     context = {
         'group': group,
@@ -32,10 +46,29 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@condition(etag_func=conditional.search_etag)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(SearchResults(query), settings.POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = get_page_obj(post_list, request.GET.get('page'))
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    post_list = author.posts.for_listing()
+    page_obj = get_page_obj(post_list, request)
+    stats = get_user_stats(author)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -43,7 +76,8 @@ def profile(request, username):
             author=author
         ).exists()
     context = {
-        'posts_count': post_list.count(),
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'author': author,
         'page_obj': page_obj,
         'user': request.user,
@@ -52,14 +86,18 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=conditional.post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = get_comments_page(post.pk, request)
     author = post.author
     context = {
         'author': author,
-        'posts_count': author.posts.count(),
+        'posts_count': get_user_stats(author).posts_count,
         'post': post,
         'form': form,
         'user': request.user,
@@ -68,13 +106,40 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@condition(etag_func=conditional.post_etag)
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = get_comments_page(post_id, request)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@use_primary
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
 
         username = request.user.username
 
@@ -89,6 +154,7 @@ def post_create(request):
 
 
 @login_required
+@use_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -100,7 +166,8 @@ def post_edit(request, post_id):
         instance=post,
     )
     if form.is_valid():
-        post.save()
+        post = form.save()
+        thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post_id)
 
     template = 'posts/create_post.html'
@@ -115,6 +182,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@use_primary
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -127,12 +195,13 @@ def add_comment(request, post_id):
 
 
 @login_required
+@condition(etag_func=conditional.follow_etag)
 def follow_index(request):
-    current_user = request.user
-    following_set = Follow.objects.filter(user=current_user)
+    following_set = Follow.objects.filter(
+        user=request.user
+    ).select_related('author')
     following_list = [follow.author for follow in following_set]
-    post_list = Post.objects.filter(author__in=following_list)
-    page_obj = get_page_obj(post_list, request.GET.get('page'))
+    page_obj = get_timeline_page(request.user, request)
     template = 'posts/follow.html'
     context = {
         'following_list': following_list,
@@ -142,6 +211,7 @@ def follow_index(request):
 
 
 @login_required
+@use_primary
 def profile_follow(request, username):
     current_user = request.user
     author = get_object_or_404(User, username=username)
@@ -159,6 +229,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@use_primary
 def profile_unfollow(request, username):
     current_user = request.user
     author = get_object_or_404(User, username=username)
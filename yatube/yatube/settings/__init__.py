@@ -0,0 +1,20 @@
+"""Настройки выбираются переменной окружения YATUBE_ENV: dev, test или prod.
+
+Без переменной — dev. Тесты указывают свой модуль явно:
+DJANGO_SETTINGS_MODULE=yatube.settings.test (pytest.ini, manage.py test).
+"""
+import os
+
+ENVIRONMENT = os.getenv('YATUBE_ENV') or 'dev'
+
+if ENVIRONMENT == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif ENVIRONMENT == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif ENVIRONMENT == 'test':
+    from .test import *  # noqa: F401,F403
+else:
+    raise ImportError(
+        f'Неизвестное окружение YATUBE_ENV={ENVIRONMENT!r}: '
+        'ожидается dev, test или prod'
+    )
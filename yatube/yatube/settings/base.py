@@ -0,0 +1,260 @@
+"""
+Django settings for yatube project: общие для всех окружений.
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = '8u6r*mbi-bhr*88%f6r23g(gy_u*rqqhvoc_c17_u!1m9&0@g!'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+    'www.mcart.pythonanywhere.com',
+    'mcart.pythonanywhere.com',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'users.apps.UsersConfig',
+    'posts.apps.PostsConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.middleware.TimingMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+# Токен сборщика метрик для /metrics/; пустой — только сотрудникам.
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATES = [
+    {
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, 'static'),
+]
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        # Значения кэша читаются через pickle: файл должен лежать там,
+        # куда могут писать только пользователь сайта, а не в общем /tmp.
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_BYTES': 64 * 1024 * 1024,
+        },
+    }
+}
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+# Потоков, в которых ASGI-приложение выполняет запросы Django.
+ASGI_THREADS = 32
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv(
+            'YATUBE_DB_PATH', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+    }
+}
+
+# Реплики только для чтения: пути к файлам SQLite через запятую.
+# Локально их наполняет команда replicate. В тестах реплики смотрят
+# в тестовую базу default.
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной базы.
+DATABASE_PRIMARY_STICKY = 5
+
+# PRAGMA, которые core выполняет на каждом новом соединении с SQLite.
+SQLITE_PRAGMAS = {}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.getenv(
+    'YATUBE_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles')
+)
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+# LOGOUT_REDIRECT_URL = 'posts:index'
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+REPRESENTATION_LENGTH = 15
+PAGINATOR_COUNT_TIMEOUT = 60
+
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько свежих постов автора попадает в ленту при подписке на него
+# или когда он опускается до порога рассылки. Более старые посты лента
+# по курсору не показывает, их видно на нумерованных страницах ?page=.
+TIMELINE_BACKFILL_LIMIT = 200
+TIMELINE_BATCH_SIZE = 500
+
+POSTS_CACHE_ALIAS = 'default'
+POSTS_CACHE_TIMEOUT = 20
+POSTS_CACHE_LOCK_TIMEOUT = 5
+# Сколько раз и с каким шагом (в секундах) ждать чужой пересчёт, когда
+# прежнего значения в кэше нет; потом воркер считает сам.
+POSTS_CACHE_WAIT_ATTEMPTS = 40
+POSTS_CACHE_WAIT_INTERVAL = 0.05
+POSTS_CACHE_BETA = 1.0
+
+# Входит в ETag страниц постов; новое значение при выкладке сбрасывает
+# закэшированные браузерами страницы, чьи шаблоны могли поменяться.
+POSTS_ETAG_SALT = os.getenv('YATUBE_RELEASE', '')
+
+POSTS_THUMBNAIL_GEOMETRY = '480x360'
+# Ещё размеры для srcset; картинка в src — POSTS_THUMBNAIL_GEOMETRY.
+# Карточка в списке не шире основной миниатюры и 960x720 не предлагает:
+# иначе телефон с плотностью 2–3 брал бы самый тяжёлый файл. Крупный
+# размер остаётся странице поста.
+POSTS_THUMBNAIL_PRESETS = ('240x180', '960x720')
+# Ширина картинки в карточке для атрибута sizes; совпадает с max-width,
+# который тег post_image ставит карточке.
+POSTS_THUMBNAIL_SIZES = '(min-width: 480px) 480px, 100vw'
+# Качество 95 по умолчанию у sorl для миниатюр избыточно: 80 на глаз
+# не отличить, а файл легче почти вдвое.
+POSTS_THUMBNAIL_OPTIONS = {'padding': True, 'quality': 80}
+POSTS_THUMBNAIL_WORKERS = 2
+# Записи sorl о миниатюрах: память процесса, кэш, затем база.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+POSTS_THUMBNAIL_LRU_SIZE = 4096
+POSTS_THUMBNAIL_LRU_TIMEOUT = 300
+
+POSTS_IMAGE_MAX_SIZE = 2048
+POSTS_IMAGE_QUALITY = 85
+POSTS_IMAGE_WEBP_QUALITY = 80
+# Процессы, в которых сжимаются загрузки; 0 — сжимать в потоке задачи.
+POSTS_IMAGE_WORKERS = 2
+
+API_MAX_PAGE_SIZE = 100
+
+TEMPLATE_WARMUP = False
+TEMPLATE_COMPILE_WARNING = 0.05
@@ -0,0 +1,55 @@
+"""Настройки для прода: YATUBE_ENV=prod."""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get(
+    'YATUBE_ALLOWED_HOSTS', 'mcart.pythonanywhere.com'
+).split(',')
+
+# Соединение живёт между запросами воркера, а транзакции на запись
+# сразу берут блокировку (BEGIN IMMEDIATE): отложенная транзакция,
+# которая позже пытается писать, при гонке получает «database is
+# locked» мгновенно, не дожидаясь busy_timeout.
+DATABASES = {
+    alias: {
+        **database,
+        'ENGINE': 'core.db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 600)),
+    }
+    for alias, database in DATABASES.items()
+}
+
+# WAL позволяет читать во время записи, NORMAL не ждёт fsync на каждом
+# коммите, busy_timeout заставляет писателей ждать друг друга.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Шаблоны читаются с диска и разбираются один раз на процесс, причём
+# заранее, при старте: первый запрос после деплоя не ждёт разбора.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+TEMPLATE_WARMUP = True
+
+# collectstatic пишет файлы с хэшем в имени и .gz рядом; отдаёт их
+# core.staticfiles.serve с кэшированием на год.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
@@ -0,0 +1,12 @@
+"""Настройки для тестов: как dev, но кэш в памяти процесса.
+
+Тесты чистят кэш, и файл кэша разработки или прода им не достаётся.
+"""
+from .dev import *  # noqa: F401,F403
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube-tests',
+    }
+}